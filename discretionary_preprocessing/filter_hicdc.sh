@@ -81,10 +81,9 @@ mkdir -p ${working_dir}/fdr_filtered/${tissue}
 
 # Create an array to keep track of which chromosome files have been
 # written
-tail -n +2 "$INPUT_FILE" \
-    | awk -v cutoff="$QVALUE_CUTOFF" -v prefix="$FILE_PREFIX" '$10 < cutoff' \
+awk -v FS='\t' -v OFS='\t' -v cutoff="$QVALUE_CUTOFF" \
+    'NR > 1 && $10 < cutoff {print $1, $2, $3, $4, $5, $6}' "$INPUT_FILE" \
     | sort -k1,1 -k2,2n \
-    | cut -f1,2,3,4,5,6 \
     > ${working_dir}/fdr_filtered/${tissue}/${tissue}_${QVALUE_CUTOFF}_filtered.txt
 
 echo "$tissue hi-c contacts filtered at q-val = $QVALUE_CUTOFF."
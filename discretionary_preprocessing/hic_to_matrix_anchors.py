@@ -18,7 +18,6 @@ Much of the code is adapted from:
 import argparse
 import contextlib
 from contextlib import ExitStack
-import csv
 import os
 import pathlib
 from typing import List, Tuple
@@ -57,30 +56,51 @@ CHR_LENS = [
 ]
 
 
-# QVAL_CUTOFFS = {
-#     0.1: "1",
-#     0.01: "01",
-#     0.001: "001",
-# }
+# FDR cutoffs and their labels, kept as strings so leading zeros survive
+QVAL_CUTOFFS = {
+    0.1: "1",
+    0.01: "01",
+    0.001: "001",
+}
+
+# rows of HiCDCPlus output to filter at a time
+CHUNKSIZE = 1_000_000
 
 
 def _split_hicdcplus_to_chrs(
     input_dir: pathlib.PosixPath, input: str, qvalue_cutoff: float
 ) -> None:
-    """Lorem"""
-    with open(input, "r") as input_file, ExitStack() as stack:
-        reader = csv.DictReader(input_file, delimiter="\t")
-        opened_files = {}
-        for row in reader:
-            if float(row["qvalue"]) <= qvalue_cutoff:
-                chr_file_name = f"input/{row['chrI']}.txt"
-                if chr_file_name not in opened_files:
-                    file_handle = stack.enter_context(open(chr_file_name, "w"))
-                    opened_files[chr_file_name] = csv.writer(
-                        file_handle, delimiter="\t"
-                    )
-                    opened_files[chr_file_name].writerow(reader.fieldnames)
-                opened_files[chr_file_name].writerow(row.values())
+    """Split HiCDCPlus output into one file per autosome, keeping only
+    interactions at or below the qvalue cutoff. Files are named by the cutoff
+    label in QVAL_CUTOFFS, e.g. chr1_qval_001.txt. The file is read in chunks
+    and the qvalue filter is vectorized; fields are kept as strings so rows are
+    written back exactly as they were read."""
+    if qvalue_cutoff not in QVAL_CUTOFFS:
+        raise ValueError(
+            f"Unsupported qvalue cutoff {qvalue_cutoff}. "
+            f"Choose from {list(QVAL_CUTOFFS)}."
+        )
+    label = QVAL_CUTOFFS[qvalue_cutoff]
+
+    header = pd.read_csv(input, sep="\t", nrows=0).columns
+    with ExitStack() as stack:
+        writers = {}
+        for chrom in CHR_LIST:
+            writers[chrom] = stack.enter_context(
+                open(
+                    input_dir / f"{chrom}_qval_{label}.txt", "w", buffering=1 << 20
+                )
+            )
+            writers[chrom].write("\t".join(header) + "\n")
+
+        for chunk in pd.read_csv(
+            input, sep="\t", dtype=str, keep_default_na=False, chunksize=CHUNKSIZE
+        ):
+            keep = (pd.to_numeric(chunk["qvalue"]) <= qvalue_cutoff) & chunk[
+                "chrI"
+            ].isin(CHR_LIST)
+            for chrom, rows in chunk[keep].groupby("chrI", sort=False):
+                rows.to_csv(writers[chrom], sep="\t", header=False, index=False)
 
     print(
         "Data processing complete. Files have been written for each chromosome with qvalues at or below the cutoff."
@@ -142,7 +162,9 @@ def process_matrices(
 ) -> None:
     """Lorem"""
     # get seq files
-    _split_hicdcplus_to_chrs(input_dir=input_dir, input=input, qval=qval)
+    _split_hicdcplus_to_chrs(
+        input_dir=pathlib.Path(input).parent, input=input, qvalue_cutoff=qval
+    )
 
     # create ref length matrices
     _create_ref_length_matrix(chr_list=chr_list, chr_lens=chr_lens)
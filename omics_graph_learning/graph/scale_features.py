@@ -23,6 +23,7 @@ from sklearn.pipeline import Pipeline  # type: ignore
 from sklearn.preprocessing import MinMaxScaler  # type: ignore
 from sklearn.preprocessing import RobustScaler  # type: ignore
 
+from omics_graph_learning.graph.scaler_kernel import scale_inplace
 from omics_graph_learning.utils.common import dir_check_make
 from omics_graph_learning.utils.common import get_physical_cores
 from omics_graph_learning.utils.common import ScalerUtils
@@ -30,42 +31,54 @@ from omics_graph_learning.utils.common import setup_logging
 
 logger = setup_logging()
 CORES = get_physical_cores()
+SCALER_PARAMS_FILE = "feat_scalers.npz"
+ORIGINAL_FEAT_FILE = "node_feat_original.npy"
+SCALED_FEAT_FILE = "node_feat_scaled.npy"
 
 
 def inverse_transform_features(
     scaled_features: np.ndarray, scalers: Dict[int, Pipeline], feat_range: int
 ) -> np.ndarray:
-    """Reverse the scaling of node features"""
+    """Reverse the scaling of node features. Each scaler is collapsed to its
+    mean and scale, so the inverse is a vectorized `x * scale + mean` over the
+    feature block instead of a reshaped sklearn call per column."""
+    params = [scaler_affine_params(scalers[i]) for i in range(feat_range)]
+    dtype = scaled_features.dtype
+    means, scales = (np.array(values, dtype=dtype) for values in zip(*params))
+
     original_features = scaled_features.copy()
-    for i in range(feat_range):
-        original_features[:, i] = (
-            scalers[i]
-            .inverse_transform(scaled_features[:, i].reshape(-1, 1))
-            .reshape(-1)
-        )
+    original_features[:, :feat_range] *= scales
+    original_features[:, :feat_range] += means
     return original_features
 
 
 def scale_graph(scaler_utility: ScalerUtils) -> Dict:
-    """Scale graph node features"""
+    """Scale graph node features. Node features are staged to disk and scaled
+    through memory maps so that the original, the scaled copy, and the rest of
+    the graph are not all resident at once."""
     dir_check_make(scaler_utility.scaler_dir)
 
     # load data
     split = scaler_utility.load_split()
     idxs = scaler_utility.load_idxs()
     graph = scaler_utility.load_graph()
-    node_features = graph["node_feat"]
+
+    # stage node features to memmaps and release the in-memory array
+    original_node_feat, scaled_node_feat = stage_node_features(
+        node_feat=graph.pop("node_feat"),
+        scaler_dir=scaler_utility.scaler_dir,
+    )
 
     # exclude validation and test genes from fitting scalers
     skip_idxs = test_and_val_genes(split=split, idxs=idxs)
 
     # feats are set up so that the last_n are one-hot encoded, so we only scale
     # the continous feats
-    feat_range = node_features.shape[1]  # total number of features
+    feat_range = original_node_feat.shape[1]  # total number of features
 
     # fit scalers!
     fit_scalers(
-        node_features=node_features,
+        feat_file=scaler_utility.scaler_dir / ORIGINAL_FEAT_FILE,
         skip_idxs=skip_idxs,
         scaler_dir=scaler_utility.scaler_dir,
         feat_range=feat_range,
@@ -77,13 +90,17 @@ def scale_graph(scaler_utility: ScalerUtils) -> Dict:
         feat_range=feat_range,
     )
 
-    # scale node features
-    original_node_feat: np.ndarray = graph[
-        "node_feat"
-    ].copy()  # save original shape for test
-    scaled_node_feat: np.ndarray = scale_node_features(
-        node_feat=graph["node_feat"],
-        scalers=scalers,
+    # load collapsed scaler parameters
+    means, scales = load_scaler_params(
+        scaler_dir=scaler_utility.scaler_dir,
+        feat_range=feat_range,
+    )
+
+    # scale node features in place on the writable memmap
+    scale_node_features(
+        node_feat=scaled_node_feat,
+        means=means,
+        scales=scales,
         feat_range=feat_range,
     )
 
@@ -103,43 +120,79 @@ def scale_graph(scaler_utility: ScalerUtils) -> Dict:
         sys.exit(1)
 
     # update graph with scaled features
-    graph["node_feat"] = scaled_node_feat
+    graph["node_feat"] = np.asarray(scaled_node_feat)
     return graph
 
 
+def stage_node_features(
+    node_feat: np.ndarray, scaler_dir: Path
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Write node features to disk and reopen them memory-mapped: a read-only
+    original for fitting and accuracy checks, and a writable copy to scale in
+    place.
+    """
+    dtype = np.float32 if node_feat.dtype == np.float32 else np.float64
+    original_file = scaler_dir / ORIGINAL_FEAT_FILE
+    np.save(original_file, np.ascontiguousarray(node_feat, dtype=dtype))
+
+    original = np.load(original_file, mmap_mode="r")
+    scaled = np.lib.format.open_memmap(
+        scaler_dir / SCALED_FEAT_FILE,
+        mode="w+",
+        dtype=original.dtype,
+        shape=original.shape,
+    )
+    scaled[:] = original
+    return original, scaled
+
+
+def remove_staged_node_features(scaler_dir: Path) -> None:
+    """Remove the memmapped node features once the scaled graph is saved."""
+    for file in (ORIGINAL_FEAT_FILE, SCALED_FEAT_FILE):
+        (scaler_dir / file).unlink(missing_ok=True)
+
+
 def test_and_val_genes(split: Dict[str, List[str]], idxs: Dict[str, int]) -> List[int]:
     """Exclude validation and test genes from fitting scalers"""
     exclude = split["validation"] + split["test"]
     return [idxs[gene] for gene in exclude if gene in idxs]
 
 
-def scaler_fit_task(scaler_fit_arguments: Tuple[int, np.ndarray, Path]) -> int:
-    """Fits scalers according to node idx."""
-    feat, node_feat, scaler_dir = scaler_fit_arguments
+def scaler_fit_task(
+    scaler_fit_arguments: Tuple[int, Path, np.ndarray, Path]
+) -> Tuple[int, float, float]:
+    """Fits scalers according to node idx. Each worker memory-maps the staged
+    features and reads only its own column for the kept rows. Returns the
+    feature index with its collapsed mean and scale."""
+    feat, feat_file, keep, scaler_dir = scaler_fit_arguments
+    node_feat = np.load(feat_file, mmap_mode="r")
     scaler = Pipeline(
         [
             ("robust", RobustScaler(quantile_range=(5, 95), unit_variance=False)),
             ("minmax", MinMaxScaler()),
         ]
     )
-    scaler.fit(node_feat[:, feat].reshape(-1, 1))
+    scaler.fit(node_feat[keep, feat].reshape(-1, 1))
     scaler_path = scaler_dir / f"feat_{feat}_scaler.joblib"
     joblib.dump(scaler, scaler_path)
-    return feat
+    mean, scale = scaler_affine_params(scaler)
+    return feat, mean, scale
 
 
 def fit_scalers(
-    node_features: np.ndarray,
+    feat_file: Path,
     skip_idxs: List[int],
     scaler_dir: Path,
     feat_range: int,
     n_jobs: int = CORES,
 ) -> None:
     """Fit the scaler and save to file in parallel. Removes any genes in the
-    validation or test sets before scaling.
+    validation or test sets before scaling. The collapsed mean and scale of
+    every scaler are additionally saved together to a single .npz.
 
     Arguments:
-        node_features (np.ndarray): The input features to scale.
+        feat_file (Path): The staged .npy of input features to scale, read
+        memory-mapped by each worker.
         skip_idxs (List[int]): Indices to skip (e.g., validation or test set
         indices).
         scaler_dir (Path): Directory to save the fitted scalers.
@@ -147,13 +200,22 @@ def fit_scalers(
         n_jobs (int): Number of parallel jobs to run. If None, uses all
         available CPU cores.
     """
-    node_feat = np.delete(node_features, skip_idxs, axis=0)  # remove validation/test
+    # keep-mask that removes validation/test rows without copying the features
+    keep = np.ones(np.load(feat_file, mmap_mode="r").shape[0], dtype=bool)
+    keep[skip_idxs] = False
 
     with Pool(processes=n_jobs) as pool:
         scaler_fit_arguments = [
-            (feat, node_feat, scaler_dir) for feat in range(feat_range)
+            (feat, feat_file, keep, scaler_dir) for feat in range(feat_range)
         ]
-        pool.map(scaler_fit_task, scaler_fit_arguments)
+        results = pool.map(scaler_fit_task, scaler_fit_arguments)
+
+    means = np.empty(feat_range, dtype=np.float64)
+    scales = np.empty(feat_range, dtype=np.float64)
+    for feat, mean, scale in results:
+        means[feat] = mean
+        scales[feat] = scale
+    np.savez(scaler_dir / SCALER_PARAMS_FILE, means=means, scales=scales)
 
     logger.info(
         f"Scalers fit and saved to {scaler_dir} for {feat_range} features w/ {n_jobs} parallel jobs."
@@ -171,13 +233,33 @@ def load_scalers(
     }
 
 
-def scale_feature_task(
-    scale_feats_arguments: Tuple[np.ndarray, Pipeline, int]
-) -> Tuple[int, np.ndarray]:
-    """Scale a single feature using the provided scaler."""
-    feature, scaler, index = scale_feats_arguments
-    scaled_feature = scaler.transform(feature.reshape(-1, 1)).reshape(1, -1)[0]
-    return index, scaled_feature
+def load_scaler_params(
+    scaler_dir: Path,
+    feat_range: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Load the collapsed scaler means and scales from a single .npz. Scalers
+    fit before the .npz existed are loaded once and cached to it."""
+    params_file = scaler_dir / SCALER_PARAMS_FILE
+    if not params_file.exists():
+        scalers = load_scalers(scaler_dir=scaler_dir, feat_range=feat_range)
+        params = [scaler_affine_params(scalers[i]) for i in range(feat_range)]
+        means, scales = (np.array(values) for values in zip(*params))
+        np.savez(params_file, means=means, scales=scales)
+
+    with np.load(params_file) as params:
+        return params["means"], params["scales"]
+
+
+def scaler_affine_params(scaler: Pipeline) -> Tuple[float, float]:
+    """Collapse a fitted RobustScaler -> MinMaxScaler pipeline into a single
+    `(x - mean) / scale` transform, so every column can be scaled by the same
+    fused kernel.
+    """
+    robust = scaler.named_steps["robust"]
+    minmax = scaler.named_steps["minmax"]
+    scale = robust.scale_[0] / minmax.scale_[0]
+    mean = robust.center_[0] - minmax.min_[0] * scale
+    return float(mean), float(scale)
 
 
 def check_feature_statistics(index: int, time: str, feature: np.ndarray) -> None:
@@ -193,32 +275,31 @@ def check_feature_statistics(index: int, time: str, feature: np.ndarray) -> None
 
 def scale_node_features(
     node_feat: np.ndarray,
-    scalers: Dict[int, RobustScaler],
+    means: np.ndarray,
+    scales: np.ndarray,
     feat_range: int,
     n_jobs: int = CORES,
 ) -> np.ndarray:
-    """Scale node features using pre-fit scalers in parallel"""
-    scaled_node_feat = node_feat.copy()  # copy to avoid modifying original
-
+    """Scale node features in place using pre-fit scaler parameters. The
+    subtract and divide are fused into a single compiled pass, so no
+    temporaries are allocated. `node_feat` must be a C-contiguous float32 or
+    float64 array, such as the memmap from `stage_node_features`."""
     # check data details before scaling
     for index in range(feat_range):
         feature = node_feat[:, index]
         check_feature_statistics(index=index, time="before scaling", feature=feature)
 
-    with Pool(processes=n_jobs) as pool:
-        scale_feats_arguments = [
-            (node_feat[:, index], scalers[index], index) for index in range(feat_range)
-        ]
-        results = pool.map(scale_feature_task, scale_feats_arguments)
+    means = np.ascontiguousarray(means[:feat_range], dtype=node_feat.dtype)
+    scales = np.ascontiguousarray(scales[:feat_range], dtype=node_feat.dtype)
 
-    # sort results by feature index and update scaled_node_feat
-    for index, scaled_feature in sorted(results):
-        scaled_node_feat[:, index] = scaled_feature
+    scale_inplace(node_feat=node_feat, means=means, scales=scales, n_jobs=n_jobs)
+
+    for index in range(feat_range):
         check_feature_statistics(
-            index=index, time="after scaling", feature=scaled_feature
+            index=index, time="after scaling", feature=node_feat[:, index]
         )
 
-    return scaled_node_feat
+    return node_feat
 
 
 def main() -> None:
@@ -233,7 +314,9 @@ def main() -> None:
     # save scaled graph
     final_graph = scaler_utility.split_dir / f"{scaler_utility.file_prefix}_scaled.pkl"
     with open(final_graph, "wb") as output:
-        pickle.dump(scaled_graph, output, protocol=4)
+        pickle.dump(scaled_graph, output, protocol=5)
+
+    remove_staged_node_features(scaler_utility.scaler_dir)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""Compiled kernel to scale node features in place. By default the parallel
+kernel is JIT compiled by numba for float32 and float64 and cached to disk. To
+avoid the JIT warmup entirely (e.g. when scaling many small tissues in a loop),
+run this module once to ahead-of-time compile the kernel into a `scaler_mod`
+extension next to this file. The AOT kernel is single-threaded, as numba cannot
+AOT-compile parallel loops, so it is only used for single jobs or small arrays.
+
+Example usage
+--------
+>>> python -m omics_graph_learning.graph.scaler_kernel
+"""
+
+
+from pathlib import Path
+
+from numba import config  # type: ignore
+from numba import njit  # type: ignore
+from numba import prange  # type: ignore
+from numba import set_num_threads  # type: ignore
+import numpy as np
+
+try:
+    from omics_graph_learning.graph import scaler_mod  # type: ignore
+except ImportError:
+    scaler_mod = None
+
+AOT_MODULE = "scaler_mod"
+AOT_MAX_ELEMENTS = 1 << 22
+SIGNATURES = {
+    "f4": "void(float32[:, ::1], float32[::1], float32[::1])",
+    "f8": "void(float64[:, ::1], float64[::1], float64[::1])",
+}
+
+
+def _scale_rows(node_feat: np.ndarray, means: np.ndarray, scales: np.ndarray):
+    """Apply `(x - mean) / scale` to the leading continuous feature columns in
+    place, parallelized over rows when JIT compiled."""
+    n_rows = node_feat.shape[0]
+    n_feats = means.shape[0]
+    for row in prange(n_rows):
+        for col in range(n_feats):
+            node_feat[row, col] = (node_feat[row, col] - means[col]) / scales[col]
+
+
+_scale_rows_jit = njit(
+    list(SIGNATURES.values()), parallel=True, fastmath=True, cache=True
+)(_scale_rows)
+
+
+def scale_inplace(
+    node_feat: np.ndarray, means: np.ndarray, scales: np.ndarray, n_jobs: int
+) -> None:
+    """Scale a C-contiguous float32 or float64 array in place. Uses the AOT
+    compiled kernel if it has been built and the scaling runs on a single job
+    or a small array, otherwise the parallel JIT kernel."""
+    small = node_feat.size <= AOT_MAX_ELEMENTS
+    if scaler_mod is not None and (n_jobs == 1 or small):
+        dtype = f"{node_feat.dtype.kind}{node_feat.dtype.itemsize}"
+        getattr(scaler_mod, f"scale_inplace_{dtype}")(node_feat, means, scales)
+        return
+
+    set_num_threads(min(n_jobs, config.NUMBA_NUM_THREADS))
+    _scale_rows_jit(node_feat, means, scales)
+
+
+def compile_aot() -> None:
+    """Ahead-of-time compile the kernel for float32 and float64 features."""
+    from numba.pycc import CC  # type: ignore
+
+    cc = CC(AOT_MODULE)
+    cc.output_dir = str(Path(__file__).parent)
+    for dtype, signature in SIGNATURES.items():
+        cc.export(f"scale_inplace_{dtype}", signature)(_scale_rows)
+    cc.compile()
+
+
+if __name__ == "__main__":
+    compile_aot()
@@ -19,6 +19,7 @@ postively or negatively affect the prediction
 
 import argparse
 from collections import deque
+import csv
 import json
 import logging
 import math
@@ -26,17 +27,15 @@ from pathlib import Path
 import pickle
 import random
 import time
-from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 import networkx as nx  # type: ignore
 import numpy as np
 import pandas as pd
 import pybedtools
 from scipy import stats  # type: ignore
-from scipy.stats import pearsonr  # type: ignore
 import torch
 import torch.nn as nn
-import torch.nn.functional as F
 from torch.optim import Optimizer
 from torch.optim.lr_scheduler import LRScheduler
 from torch.optim.lr_scheduler import ReduceLROnPlateau
@@ -45,7 +44,6 @@ from torch_geometric.data import Data  # type: ignore
 from torch_geometric.loader import NeighborLoader  # type: ignore
 from torch_geometric.utils import from_networkx  # type: ignore
 from torch_geometric.utils import k_hop_subgraph  # type: ignore
-from torch_geometric.utils import to_networkx  # type: ignore
 from tqdm import tqdm  # type: ignore
 
 from omics_graph_learning.architecture_builder import build_gnn_architecture
@@ -280,7 +278,7 @@ class GNNTrainer:
         )
         return final_loss, final_regression, final_classification
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def evaluate(
         self,
         data_loader: torch_geometric.data.DataLoader,
@@ -326,7 +324,7 @@ class GNNTrainer:
             torch.cat(regression_labels),
         )
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def evaluate_single(
         self,
         data: torch_geometric.data.Data,
@@ -358,15 +356,28 @@ class GNNTrainer:
         regression_outs: List[torch.Tensor],
         regression_labels: List[torch.Tensor],
     ) -> Tuple[float, float]:
-        """Compute RMSE and Pearson's R for regression task."""
+        """Compute RMSE and Pearson's R for regression task from running sums
+        over the per-batch outputs."""
         if not regression_outs or not regression_labels:
             return 0.0, 0.0
 
-        predictions = torch.cat(regression_outs).squeeze()
-        targets = torch.cat(regression_labels).squeeze()
-        mse = F.mse_loss(predictions, targets)
-        rmse = torch.sqrt(mse).item()
-        pearson_r, _ = pearsonr(predictions.numpy(), targets.numpy())
+        # running sums of x, y, x^2, y^2, and xy
+        sums = torch.zeros(5, dtype=torch.float64)
+        n = 0
+        for out, label in zip(regression_outs, regression_labels):
+            x = out.detach().flatten().double().cpu()
+            y = label.detach().flatten().double().cpu()
+            sums += torch.stack([x.sum(), y.sum(), x @ x, y @ y, x @ y])
+            n += x.numel()
+
+        if n == 0:
+            return 0.0, 0.0
+
+        sum_x, sum_y, sum_xx, sum_yy, sum_xy = sums.tolist()
+        rmse = math.sqrt(max(sum_xx - 2 * sum_xy + sum_yy, 0.0) / n)
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x**2) * (n * sum_yy - sum_y**2)
+        pearson_r = covariance / math.sqrt(variance) if variance > 0 else math.nan
 
         return rmse, pearson_r
 
@@ -576,12 +587,17 @@ def delete_node(data: Data, node_idx: int) -> Data:
 
 def load_gencode_lookup(filepath: str) -> Dict[str, str]:
     """Load the Gencode to gene symbol lookup table."""
-    gencode_to_symbol = {}
-    with open(filepath, "r") as f:
-        for line in f:
-            gencode, symbol = line.strip().split("\t")
-            gencode_to_symbol[symbol] = gencode
-    return gencode_to_symbol
+    lookup = pd.read_csv(
+        filepath,
+        sep="\t",
+        header=None,
+        names=["gencode", "symbol"],
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        engine="c",
+    )
+    return dict(zip(lookup["symbol"].to_numpy(), lookup["gencode"].to_numpy()))
 
 
 def _rename_tuple(
@@ -644,27 +660,17 @@ def load_crispri(
 
     """
 
-    def reorder(feature: Any) -> Any:
-        """Reorder the features."""
-        chrom = feature[6]
-        start = feature[7]
-        end = feature[8]
-        name = feature[3]
-        gene = feature[4]
-        regulation = feature[5]
-        return pybedtools.create_interval_from_list(
-            [chrom, start, end, gene, regulation, name]
-        )
-
     # load the file as a bedtool
     # _add_hash_if_missing(crispr_benchmarks)
     links = pybedtools.BedTool(crispr_benchmarks).cut([0, 1, 2, 3, 8, 19])
 
-    # intersect with enhancer catalogue, but only keep the enhancer, gene, and
-    # regulation bool
-    links = links.intersect(enhancer_catalogue, wa=True, wb=True).each(reorder).saveas()
-
-    return {(f"{link[0]}_{link[1]}_enhancer", link[3], link[4]) for link in links}
+    # intersect with enhancer catalogue and read the enhancer, gene, and
+    # regulation bool straight off the streamed overlaps
+    overlaps = links.intersect(enhancer_catalogue, wa=True, wb=True, stream=True)
+    return {
+        (f"{overlap[6]}_{overlap[7]}_enhancer", overlap[4], overlap[5])
+        for overlap in overlaps
+    }
 
 
 def filter_links_for_present_nodes(
@@ -758,9 +764,6 @@ def main() -> None:
     # load the pytorch graph
     graph = torch.load("graph.pt")
 
-    # create nx graph
-    nx_graph = to_networkx(graph, to_undirected=True)
-
     # load IDXS
     with open(idx_file, "rb") as f:
         idxs = pickle.load(f)
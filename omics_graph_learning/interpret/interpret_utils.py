@@ -7,9 +7,11 @@ experiments.
 """
 
 
+import csv
 import pickle
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 import torch
 from torch_geometric.data import Data  # type: ignore
@@ -20,12 +22,33 @@ from omics_graph_learning.interpret.perturb_runner import PerturbRunner
 
 def load_gencode_lookup(filepath: str) -> Dict[str, str]:
     """Load the Gencode-to-gene-symbol lookup table."""
-    gencode_to_symbol = {}
-    with open(filepath, "r") as f:
-        for line in f:
-            gencode, symbol = line.strip().split("\t")
-            gencode_to_symbol[symbol] = gencode
-    return gencode_to_symbol
+    lookup = pd.read_csv(
+        filepath,
+        sep="\t",
+        header=None,
+        names=["gencode", "symbol"],
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        engine="c",
+    )
+    return dict(zip(lookup["symbol"].to_numpy(), lookup["gencode"].to_numpy()))
+
+
+def loader_kwargs(data: Data, num_workers: int = 4) -> Dict[str, Any]:
+    """NeighborLoader options to sample in background workers and return
+    pinned batches, so sampling and host to device copies overlap with the
+    forward pass. Only applies to host-resident graphs, as workers cannot
+    sample from tensors already on the GPU.
+    """
+    if data.x.is_cuda:
+        return {}
+    return {
+        "num_workers": num_workers,
+        "persistent_workers": True,
+        "pin_memory": torch.cuda.is_available(),
+        "prefetch_factor": 4,
+    }
 
 
 def combine_masks(data: Data) -> Data:
@@ -48,6 +71,7 @@ def load_data_and_model(
     idx_file: str,
     model_file: str,
     device: torch.device,
+    half_precision: bool = False,
 ) -> Tuple[
     Data,
     PerturbRunner,
@@ -57,12 +81,19 @@ def load_data_and_model(
     Dict[str, int],
     Dict[str, str],
 ]:
-    """Load model, Data object, and index mappings."""
+    """Load model, Data object, and index mappings. If half_precision is set,
+    node features are kept in float16 on host, halving the bytes sliced and
+    copied per batch. The model upcasts them on input, so regression outputs
+    stay within float16 rounding of the float32 run.
+    """
     # load gencode: symbol table
     gencode_to_symbol = load_gencode_lookup(lookup_file)
 
-    # load PyG data
-    data = torch.load(graph_file).to(device)
+    # load PyG data, kept host-resident so loaders can sample in workers. the
+    # model upcasts half precision features on input
+    data = torch.load(graph_file)
+    if half_precision:
+        data.x = data.x.half()
 
     # load node index dictionary
     with open(idx_file, "rb") as f:
@@ -110,6 +141,7 @@ def get_baseline_predictions(
         batch_size=64,
         input_nodes=getattr(data, f"{mask}_mask"),
         shuffle=False,
+        **loader_kwargs(data),
     )
 
     preds, labels, node_indices = runner.evaluate(
@@ -134,6 +166,34 @@ def get_baseline_predictions(
     )
 
 
+def filter_gene_nodes(
+    df: pd.DataFrame,
+    node_idx_to_gene_id: Dict[int, str],
+    gene_indices: List[int],
+) -> pd.DataFrame:
+    """Keep only gene node predictions and add their gene IDs. Membership and
+    ID lookup are done on numpy arrays instead of per-row pandas isin and map.
+    """
+    node_idxs = df["node_idx"].to_numpy()
+    gene_mask = np.isin(node_idxs, np.fromiter(gene_indices, dtype=np.int64))
+    gene_node_idxs = node_idxs[gene_mask]
+
+    # dense node_idx -> gene_id lookup array
+    id_lookup = np.empty(max(node_idx_to_gene_id, default=-1) + 1, dtype=object)
+    id_lookup[np.fromiter(node_idx_to_gene_id.keys(), dtype=np.int64)] = list(
+        node_idx_to_gene_id.values()
+    )
+
+    return pd.DataFrame(
+        {
+            "node_idx": gene_node_idxs,
+            "prediction": df["prediction"].to_numpy()[gene_mask],
+            "label": df["label"].to_numpy()[gene_mask],
+            "gene_id": id_lookup[gene_node_idxs],
+        }
+    )
+
+
 def get_best_predictions(
     df: pd.DataFrame,
     node_idx_to_gene_id: Dict[int, str],
@@ -152,27 +212,29 @@ def get_best_predictions(
     if gencode_to_symbol is None:
         gencode_to_symbol = {}
 
-    # filter for gene nodes
-    df_genes = df[df["node_idx"].isin(gene_indices)].copy()
-
-    # map node indices to gene IDs
-    df_genes["gene_id"] = df_genes["node_idx"].map(node_idx_to_gene_id)
+    # filter for gene nodes and map node indices to gene IDs
+    df_genes = filter_gene_nodes(df, node_idx_to_gene_id, gene_indices)
 
     # compute differences without absolute value
-    df_genes["diff"] = df_genes["prediction"] - df_genes["label"]
+    prediction = df_genes["prediction"].to_numpy()
+    diff = prediction - df_genes["label"].to_numpy()
 
     # filter genes with predicted output > prediction_threshold
-    df_filtered = df_genes[df_genes["prediction"] > prediction_threshold]
+    passing = np.flatnonzero(prediction > prediction_threshold)
 
     # check if there are enough genes after filtering
-    if df_filtered.empty:
+    if passing.size == 0:
         print(f"No gene predictions greater than {prediction_threshold} found.")
         return []
 
     # select topk genes with the smallest absolute difference
-    df_topk = df_filtered.reindex(
-        df_filtered["diff"].abs().sort_values(ascending=True).index
-    ).head(topk)
+    _, top = torch.topk(
+        torch.from_numpy(np.abs(diff[passing])),
+        k=min(topk, passing.size),
+        largest=False,
+    )
+    rows = passing[top.numpy()]
+    df_topk = df_genes.iloc[rows].assign(diff=diff[rows])
 
     # get topk gene IDs and their corresponding node indices
     topk_node_indices = df_topk["node_idx"].tolist()
@@ -5,14 +5,15 @@
 """Perturb node features and measure impact on model output."""
 
 
-from collections import defaultdict
 from typing import Dict, List, Tuple
 
 import torch
+import torch.nn as nn
 from torch_geometric.data import Data  # type: ignore
 from torch_geometric.loader import NeighborLoader  # type: ignore
 from tqdm import tqdm  # type: ignore
 
+from omics_graph_learning.interpret.interpret_utils import loader_kwargs
 from omics_graph_learning.interpret.perturb_runner import PerturbRunner
 
 
@@ -28,114 +29,156 @@ def get_test_loader(
         batch_size=batch_size,
         input_nodes=getattr(data, f"{mask}_mask"),
         shuffle=False,
+        **loader_kwargs(data),
     )
 
 
-def compute_baseline_output(
-    runner: PerturbRunner,
+def stack_feature_perturbations(
     batch: Data,
     mask_tensor: torch.Tensor,
-) -> torch.Tensor:
-    """Compute baseline model output for comparison."""
-    with torch.no_grad():
-        baseline_out, _ = runner.model(
-            x=batch.x,
-            edge_index=batch.edge_index,
-            mask=mask_tensor,
+    feature_indices: List[int],
+    model: nn.Module,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+    """Build a disjoint union of the batch with itself: copy 0 is the baseline
+    and copy i + 1 has feature_indices[i] zeroed out. Edges of each copy are
+    shifted by the copy's node offset, so every copy is an isolated graph and
+    the baseline and all perturbations are computed in one forward pass.
+
+    The union is only exact for models that keep copies apart, so models with
+    an attention task head, which attends across every node, are rejected.
+
+    Returns:
+        (x, edge_index, mask, batch) for the stacked graph.
+    """
+    if getattr(model, "attention_task_head", False):
+        raise ValueError(
+            "Stacked feature perturbations are not supported for models with an "
+            "attention task head."
         )
-    return baseline_out[mask_tensor].cpu()
+
+    device = batch.x.device
+    num_copies = len(feature_indices) + 1
+    num_nodes = batch.num_nodes
+    num_edges = batch.edge_index.size(1)
+
+    x_stack = batch.x.unsqueeze(0).repeat(num_copies, 1, 1)
+    x_stack[
+        torch.arange(1, num_copies, device=device),
+        :,
+        torch.tensor(feature_indices, device=device),
+    ] = 0
+
+    copies = torch.arange(num_copies, device=device)
+    offsets = copies.repeat_interleave(num_edges) * num_nodes
+    edge_index = batch.edge_index.repeat(1, num_copies) + offsets
+
+    return (
+        x_stack.view(num_copies * num_nodes, -1),
+        edge_index,
+        mask_tensor.repeat(num_copies),
+        copies.repeat_interleave(num_nodes),
+    )
 
 
 def compute_feature_perturbation(
     runner: PerturbRunner,
     batch: Data,
     mask_tensor: torch.Tensor,
-    baseline_output: torch.Tensor,
     feature_indices: List[int],
-) -> Dict[int, Dict[int, List[float]]]:
+) -> Tuple[torch.Tensor, torch.Tensor]:
     """For each feature index, zero out that feature in the batch and compute
-    the difference in model output from the baseline.
+    the difference in model output from the baseline. The baseline and every
+    perturbation are run as a single batched model call. Sampled batches differ
+    in shape, so kernel reuse is left to the dynamically compiled model from
+    PerturbRunner.load_model rather than captured by hand per batch.
 
     Returns:
-        {feature_index: {node_index: [differences]}}
+        (node_indices [n_masked], differences [n_features, n_masked])
     """
-    feature_node_differences = defaultdict(lambda: defaultdict(list))
-    node_indices = batch.n_id[mask_tensor].cpu()
-
-    for feat_idx in feature_indices:
-        x_perturbed = batch.x.clone()
-        x_perturbed[:, feat_idx] = 0  # zero out selected feature
-
-        with torch.no_grad():
-            perturbed_out, _ = runner.model(
-                x=x_perturbed,
-                edge_index=batch.edge_index,
-                mask=mask_tensor,
-            )
-        perturbed_out = perturbed_out[mask_tensor].cpu()
-
-        diff = baseline_output - perturbed_out
-        for idx, d in zip(node_indices, diff):
-            feature_node_differences[feat_idx][idx.item()].append(d.item())
-
-    return feature_node_differences
-
+    x, edge_index, stacked_mask, graph_batch = stack_feature_perturbations(
+        batch=batch,
+        mask_tensor=mask_tensor,
+        feature_indices=feature_indices,
+        model=runner.model,
+    )
+    with torch.inference_mode():
+        stacked_out, _ = runner.model(
+            x=x,
+            edge_index=edge_index,
+            mask=stacked_mask,
+            batch=graph_batch,
+        )
 
-def compute_average_node_differences(
-    feature_node_differences: Dict[int, Dict[int, List[float]]]
-) -> Dict[int, Dict[int, float]]:
-    """Compute the average difference for each node, for each feature index.
+    # rows are [baseline, *perturbations], columns are masked nodes
+    stacked_out = stacked_out.view(len(feature_indices) + 1, -1)[:, mask_tensor]
+    diffs = stacked_out[0] - stacked_out[1:]
+    return batch.n_id[mask_tensor].cpu(), diffs.cpu()
 
-    Args:
-        feature_node_differences: {feature_index: node_index: [differences]}
 
-    Returns:
-        {feature_index: node_index: average difference}
+class NodeDifferenceAccumulator:
+    """Running per-node sums of perturbation differences for every feature,
+    indexed by a node's position among the masked nodes of the full graph.
+    Replaces per-node lists of differences with two dense tensors.
     """
-    return {
-        feat_idx: {node: sum(vals) / len(vals) for node, vals in node_diffs.items()}
-        for feat_idx, node_diffs in feature_node_differences.items()
-    }
 
-
-def compute_fold_changes(avg_diffs: Dict[int, Dict[int, float]]) -> Dict[int, float]:
+    def __init__(self, node_mask: torch.Tensor, num_features: int) -> None:
+        """Initialize the accumulator."""
+        self.node_ids = node_mask.nonzero().squeeze(1).cpu()
+        num_nodes = self.node_ids.numel()
+        self.positions = torch.full((node_mask.numel(),), -1, dtype=torch.long)
+        self.positions[self.node_ids] = torch.arange(num_nodes)
+        self.sums = torch.zeros(num_features, num_nodes, dtype=torch.float64)
+        self.counts = torch.zeros(num_nodes, dtype=torch.long)
+
+    def add(self, node_indices: torch.Tensor, diffs: torch.Tensor) -> None:
+        """Add one batch of [n_features, n_masked] differences."""
+        positions = self.positions[node_indices]
+        self.sums.index_add_(1, positions, diffs.double())
+        self.counts.index_add_(0, positions, torch.ones_like(positions))
+
+    def average(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Return the seen node indices and their [n_features, n_seen] average
+        differences."""
+        seen = self.counts > 0
+        return self.node_ids[seen], self.sums[:, seen] / self.counts[seen]
+
+
+def compute_fold_changes(
+    feature_indices: List[int], avg_diffs: torch.Tensor
+) -> Dict[int, float]:
     """Compute the overall average difference (fold change) per feature index.
 
     Args:
-        avg_diffs: {feature_index: node_index: average difference}
+        feature_indices: feature index of each row of avg_diffs
+        avg_diffs: [n_features, n_nodes] average difference per node
 
     Returns:
         {feature_index: overall average difference}
     """
-    feature_fold_changes = {}
-    for feat_idx, node_dict in avg_diffs.items():
-        total_diff = sum(node_dict.values())
-        num_nodes = len(node_dict)
-        avg_diff = total_diff / num_nodes if num_nodes else 0
-        feature_fold_changes[feat_idx] = avg_diff
-    return feature_fold_changes
+    if avg_diffs.size(1) == 0:
+        return {feat_idx: 0 for feat_idx in feature_indices}
+    return dict(zip(feature_indices, avg_diffs.mean(dim=1).tolist()))
 
 
 def get_top_n_nodes(
-    avg_diffs_for_feature: Dict[int, float],
+    node_ids: torch.Tensor,
+    avg_diffs_for_feature: torch.Tensor,
     n: int = 100,
 ) -> List[Tuple[int, float]]:
     """Get the top N nodes by absolute difference.
 
     Args:
-        avg_diffs_for_feature: {node_idx: difference}
+        node_ids: node index of each entry of avg_diffs_for_feature
+        avg_diffs_for_feature: average difference per node
         n: Number of top nodes to retrieve.
 
     Returns:
         List of (node_idx, diff) sorted in descending order of absolute
         difference.
     """
-    sorted_node_diffs = sorted(
-        avg_diffs_for_feature.items(),
-        key=lambda x: abs(x[1]),
-        reverse=True,
-    )
-    return sorted_node_diffs[:n]
+    k = min(n, avg_diffs_for_feature.numel())
+    _, top = torch.topk(avg_diffs_for_feature.abs(), k)
+    return list(zip(node_ids[top].tolist(), avg_diffs_for_feature[top].tolist()))
 
 
 def map_nodes_to_symbols(
@@ -167,7 +210,8 @@ def map_nodes_to_symbols(
 
 def get_top_feature_genes(
     feature_indices: List[int],
-    avg_diffs: Dict[int, Dict[int, float]],
+    node_ids: torch.Tensor,
+    avg_diffs: torch.Tensor,
     top_n: int,
     node_idx_to_gene_id: Dict[int, str],
     gencode_to_symbol: Dict[str, str],
@@ -176,8 +220,8 @@ def get_top_feature_genes(
     to gene symbols.
     """
     feature_top_genes = {}
-    for feat_idx in feature_indices:
-        top_nodes = get_top_n_nodes(avg_diffs[feat_idx], n=top_n)
+    for row, feat_idx in enumerate(feature_indices):
+        top_nodes = get_top_n_nodes(node_ids, avg_diffs[row], n=top_n)
         top_genes = map_nodes_to_symbols(
             top_nodes,
             node_idx_to_gene_id=node_idx_to_gene_id,
@@ -218,40 +262,36 @@ def perturb_node_features(
         ({feature_index: overall average diff}, {feature_index: list of top gene diffs})
     """
     test_loader = get_test_loader(data, mask)
-    global_differences = defaultdict(lambda: defaultdict(list))
+    accumulator = NodeDifferenceAccumulator(
+        node_mask=getattr(data, f"{mask}_mask_loss"),
+        num_features=len(feature_indices),
+    )
 
     for batch in tqdm(test_loader, desc="Node Feature Perturbation"):
-        batch = batch.to(device)
+        batch = batch.to(device, non_blocking=True)
         mask_tensor = getattr(batch, f"{mask}_mask_loss")
 
         # skip if no gene nodes present
         if mask_tensor.sum() == 0:
             continue
 
-        baseline_out = compute_baseline_output(runner, batch, mask_tensor)
-
         # compute differences for each feature index
-        batch_differences = compute_feature_perturbation(
+        node_indices, diffs = compute_feature_perturbation(
             runner=runner,
             batch=batch,
             mask_tensor=mask_tensor,
-            baseline_out=baseline_out,
             feature_indices=feature_indices,
-            device=device,
         )
-
-        # aggregate differences across batches
-        for feat_idx, node_dict in batch_differences.items():
-            for node_idx, diffs in node_dict.items():
-                global_differences[feat_idx][node_idx].extend(diffs)
+        accumulator.add(node_indices, diffs)
 
     # compute avg difference and fold changes
-    avg_diffs = compute_average_node_differences(global_differences)
-    feature_fold_changes = compute_fold_changes(avg_diffs)
+    node_ids, avg_diffs = accumulator.average()
+    feature_fold_changes = compute_fold_changes(feature_indices, avg_diffs)
 
     # get top nodes and map to gene symbols
     feature_top_genes = get_top_feature_genes(
         feature_indices=feature_indices,
+        node_ids=node_ids,
         avg_diffs=avg_diffs,
         top_n=top_n,
         node_idx_to_gene_id=node_idx_to_gene_id,
@@ -5,7 +5,7 @@
 """Inference runner for perturbation experiments."""
 
 
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
 import torch
 import torch.nn as nn
@@ -15,6 +15,9 @@ from tqdm import tqdm  # type: ignore
 
 from omics_graph_learning.architecture_builder import build_gnn_architecture
 from omics_graph_learning.combination_loss import CombinationLoss
+from omics_graph_learning.utils.common import setup_logging
+
+logger = setup_logging()
 
 
 class PerturbRunner:
@@ -87,12 +90,13 @@ class PerturbRunner:
             mask=mask,
         )
 
-        # collect masked outputs and labels
-        regression_out_masked = self._ensure_tensor_dim(regression_out[mask])
-        labels_masked = self._ensure_tensor_dim(data.y[mask])
+        # collect masked outputs and labels, as views if every node is masked
+        index = self._mask_index(mask)
+        regression_out_masked = self._ensure_tensor_dim(regression_out[index])
+        labels_masked = self._ensure_tensor_dim(data.y[index])
 
-        classification_out_masked = self._ensure_tensor_dim(logits[mask])
-        class_labels_masked = self._ensure_tensor_dim(data.class_labels[mask])
+        classification_out_masked = self._ensure_tensor_dim(logits[index])
+        class_labels_masked = self._ensure_tensor_dim(data.class_labels[index])
 
         return (
             loss,
@@ -104,7 +108,7 @@ class PerturbRunner:
             class_labels_masked,
         )
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def evaluate(
         self,
         data_loader: torch_geometric.data.DataLoader,
@@ -134,7 +138,7 @@ class PerturbRunner:
             if subset_batches and batch_idx >= subset_batches:
                 break
 
-            data = data.to(self.device)
+            data = data.to(self.device, non_blocking=True)
             mask_tensor = getattr(data, f"{mask}_mask_loss")
 
             # skip batches with no nodes in the mask
@@ -149,10 +153,11 @@ class PerturbRunner:
                 mask=mask_tensor,
             )
 
-            # collect masked outputs and labels
-            regression_out_masked = regression_out[mask_tensor]
-            labels_masked = data.y[mask_tensor]
-            batch_node_indices = data.n_id[mask_tensor].cpu()
+            # collect masked outputs and labels, as views if every node is masked
+            index = self._mask_index(mask_tensor)
+            regression_out_masked = regression_out[index]
+            labels_masked = data.y[index]
+            batch_node_indices = data.n_id[index]
 
             # ensure tensors are at least one-dimensional
             if regression_out_masked.dim() == 0:
@@ -160,13 +165,19 @@ class PerturbRunner:
                 labels_masked = labels_masked.unsqueeze(0)
                 batch_node_indices = batch_node_indices.unsqueeze(0)
 
-            regression_outs.append(regression_out_masked.cpu())
-            regression_labels.append(labels_masked.cpu())
-            node_indices.append(batch_node_indices)
+            # start the copies to host before the next forward pass, so nothing
+            # kept across batches refers to the model's output memory
+            regression_outs.append(self._to_host(regression_out_masked))
+            regression_labels.append(self._to_host(labels_masked))
+            node_indices.append(self._to_host(batch_node_indices))
 
             pbar.update(1)
         pbar.close()
 
+        # wait once for all pending device to host copies
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+
         if regression_outs:
             regression_outs = torch.cat(regression_outs, dim=0)
             regression_labels = torch.cat(regression_labels, dim=0)
@@ -178,7 +189,7 @@ class PerturbRunner:
 
         return regression_outs, regression_labels, node_indices
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def evaluate_single(
         self,
         data: torch_geometric.data.Data,
@@ -205,7 +216,7 @@ class PerturbRunner:
 
         return regression_out_masked.cpu(), labels_masked.cpu()
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def infer_subgraph(
         self,
         sub_data: torch_geometric.data.Data,
@@ -225,7 +236,7 @@ class PerturbRunner:
         print(f"Regression output without mask: {regression_out}")
         return regression_out
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def infer_perturbed_subgraph(
         self,
         sub_data: torch_geometric.data.Data,
@@ -319,7 +330,38 @@ class PerturbRunner:
         checkpoint = torch.load(checkpoint_file, map_location=map_location)
         model.load_state_dict(checkpoint, strict=False)
         model.eval()
-        return model
+        return PerturbRunner._compile_for_inference(
+            model=model, in_size=in_size, device=map_location
+        )
+
+    @staticmethod
+    def _compile_for_inference(
+        model: nn.Module, in_size: int, device: torch.device
+    ) -> nn.Module:
+        """Compile the model with dynamic shapes so sampled batches of
+        different sizes reuse the same kernels. CUDA graphs are not used, as
+        they are recorded once per concrete batch size. Compilation is lazy, so
+        a warm-up forward pass on a small ring graph triggers it here and falls
+        back to the eager model if it fails.
+        """
+        if not torch.cuda.is_available():
+            return model
+        num_nodes = 4
+        nodes = torch.arange(num_nodes, device=device)
+        try:
+            compiled = torch.compile(
+                model, mode="max-autotune-no-cudagraphs", dynamic=True
+            )
+            with torch.inference_mode():
+                compiled(
+                    x=torch.zeros(num_nodes, in_size, device=device),
+                    edge_index=torch.stack([nodes, nodes.roll(-1)]),
+                    mask=torch.ones(num_nodes, dtype=torch.bool, device=device),
+                )
+        except Exception as error:
+            logger.warning(f"torch.compile failed, using eager model: {error}")
+            return model
+        return compiled
 
     @staticmethod
     def calculate_log2_fold_change(
@@ -329,6 +371,20 @@ class PerturbRunner:
         log2_fold_change = perturbation_prediction - baseline_prediction
         return 2**log2_fold_change - 1
 
+    @staticmethod
+    def _to_host(tensor: torch.Tensor) -> torch.Tensor:
+        """Start a non-blocking copy of a tensor to pinned host memory. The
+        copy must be synchronized before the result is read.
+        """
+        return tensor.to("cpu", non_blocking=True)
+
+    @staticmethod
+    def _mask_index(mask: torch.Tensor) -> Union[slice, torch.Tensor]:
+        """Index for selecting masked nodes. A full mask selects everything
+        with a slice, which returns a view instead of a boolean-indexed copy.
+        """
+        return slice(None) if bool(mask.all()) else mask
+
     @staticmethod
     def _ensure_tensor_dim(tensor: torch.Tensor) -> torch.Tensor:
         """Ensure tensor has the correct dimensions for evaluation."""
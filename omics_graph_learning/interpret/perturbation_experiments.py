@@ -6,6 +6,7 @@
 
 
 import argparse
+import os
 
 from scipy.stats import ttest_ind  # type: ignore
 import torch
@@ -58,11 +59,21 @@ def parse_args() -> argparse.Namespace:
         default="/coessential_neg.txt",
         help="Path to negative coessential pairs file.",
     )
+    parser.add_argument(
+        "--half_precision",
+        action="store_true",
+        help="Keep node features in float16 on host to halve per-batch copies.",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
     """Run graph perturbation experiments."""
+    # let the caching allocator grow segments in place across the variably
+    # sized sampled batches. must be set before the first CUDA allocation.
+    os.environ.setdefault(
+        "PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:512"
+    )
     args = parse_args()
     sample = args.sample
     run = args.run
@@ -103,7 +114,14 @@ def main() -> None:
         idxs_inv,
         idxs,
         gencode_to_symbol,
-    ) = load_data_and_model(lookup_file, graph_file, idx_file, model_file, device)
+    ) = load_data_and_model(
+        lookup_file,
+        graph_file,
+        idx_file,
+        model_file,
+        device,
+        half_precision=args.half_precision,
+    )
 
     # get baseline predictions
     df = get_baseline_predictions(data, mask, runner)
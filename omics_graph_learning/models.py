@@ -248,6 +248,7 @@ class ModularGNN(nn.Module):
         x: torch.Tensor,
         edge_index: torch.Tensor,
         mask: torch.Tensor,
+        batch: Optional[torch.Tensor] = None,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         """Forward pass of the neural network.
 
@@ -257,11 +258,15 @@ class ModularGNN(nn.Module):
             mask: Boolean mask of shape (num_nodes,) indicating which
             nodes should be regressed. True for nodes to be regressed, False
             otherwise.
+            batch: Optional graph assignment vector of shape (num_nodes,) so
+            that normalization is computed per graph when several graphs are
+            stacked as a disjoint union.
 
         Returns:
             torch.Tensor: The output tensor.
         """
         try:
+            x = x.float()  # upcast half precision host features
             h1 = x  # save input for residual connections
 
             # graph convolutions with normalization and optional residual connections.
@@ -271,14 +276,20 @@ class ModularGNN(nn.Module):
                         residual = (
                             self.linear_projection(h1) if conv == self.convs[0] else x
                         )
-                        x = self.activation(batch_norm(conv(x, edge_index))) + residual
+                        x = (
+                            self.activation(batch_norm(conv(x, edge_index), batch))
+                            + residual
+                        )
                     elif isinstance(self.linear_projection, nn.ModuleList):
                         residual = self.linear_projection[i](
                             h1 if conv == self.convs[0] else x
                         )
-                        x = self.activation(batch_norm(conv(x, edge_index))) + residual
+                        x = (
+                            self.activation(batch_norm(conv(x, edge_index), batch))
+                            + residual
+                        )
                 else:
-                    x = self.activation(batch_norm(conv(x, edge_index)))
+                    x = self.activation(batch_norm(conv(x, edge_index), batch))
 
                 # check for NaN values
                 if torch.isnan(x).any():
@@ -292,6 +303,7 @@ class ModularGNN(nn.Module):
                 activation=self.activation,
                 dropout_rate=self.dropout_rate,
                 training=self.training,
+                batch=batch,
             )
 
             # apply regression task head
@@ -534,16 +546,27 @@ class DeeperGCN(nn.Module):
         x: torch.Tensor,
         edge_index: torch.Tensor,
         mask: torch.Tensor,
+        batch: Optional[torch.Tensor] = None,
     ) -> Tuple[torch.Tensor, torch.Tensor]:
         """Forward pass of the neural network.
 
         Args:
             x: The input tensor.
             edge_index: The edge index tensor.
+            batch: Not supported. DeepGCNLayer and GENConv call their layer
+            norms without a graph assignment, so stacked graphs would share
+            normalization statistics.
 
         Returns:
             torch.Tensor: The output tensor.
         """
+        if batch is not None:
+            raise ValueError(
+                "DeeperGCN cannot normalize per graph, so stacked graphs are "
+                "not supported."
+            )
+        x = x.float()  # upcast half precision host features
+
         # graph convolutions
         for conv in self.convs:
             x = conv(x, edge_index)
@@ -770,10 +793,11 @@ def apply_mlp_layers(
     activation: Callable[[torch.Tensor], torch.Tensor],
     training: bool = True,
     dropout_rate: Optional[float] = None,
+    batch: Optional[torch.Tensor] = None,
 ) -> torch.Tensor:
     """Apply linear layers, normalization, activation, and optional dropout."""
     for linear_layer, layer_norm in zip(linear_layers, layer_norms):
-        x = activation(layer_norm(linear_layer(x)))
+        x = activation(layer_norm(linear_layer(x), batch))
         # x = layer_norm(activation(linear_layer(x)))
         if isinstance(dropout_rate, float):
             x = F.dropout(x, p=dropout_rate, training=training)
@@ -6,6 +6,8 @@
 start and end features."""
 
 
+from typing import Dict, List, Tuple
+
 import cooler  # type: ignore
 import numpy as np
 import pandas as pd
@@ -30,6 +32,8 @@ class PositionalEncoding(nn.Module):
     forward(chr, node_start, node_end):
         Get the positional encoding for a given chromosome, start, and end
         position.
+    forward_batch(chroms, starts, ends):
+        Get the positional encodings for many intervals in a single lookup.
 
     Examples:
     --------
@@ -42,6 +46,7 @@ class PositionalEncoding(nn.Module):
         super(PositionalEncoding, self).__init__()
         self.embedding_dim = embedding_dim
         self.bins_df = self.get_bins(chromsize_file=chromfile, binsize=binsize)
+        self._chrom_bins = self.index_bins_by_chromosome(self.bins_df)
         self.embedding = nn.Embedding(len(self.bins_df), embedding_dim)
 
         # initialize embeddings weights
@@ -49,24 +54,12 @@ class PositionalEncoding(nn.Module):
 
     def get_bin_indices(self, chromosome: str, start: int, end: int) -> np.ndarray:
         """Get all bin indices that overlap with a given chromosome, start, and end position."""
-        chrom_bins = self.bins_df[self.bins_df["chrom"] == chromosome]
-
-        if chrom_bins.empty:
-            raise ValueError(f"Warning: No bins found for chromosome {chromosome}")
-
-        # get the start and end values for the bins
-        start_values = chrom_bins["start"]
-        end_values = chrom_bins["end"]
-
-        # check that the start and end values are within the chromosome
-        chrom_start = start_values.min()
-        chrom_end = end_values.max()
-        if start < chrom_start or end > chrom_end:
-            print(
-                f"Warning: Coordinates ({start}, {end}) "
-                f"out of bounds for chromosome {chromosome}"
-            )
-            print(f"Chromosome range: {chrom_start} - {chrom_end}")
+        try:
+            start_values, end_values, bin_idxs = self._chrom_bins[chromosome]
+        except KeyError as error:
+            raise ValueError(
+                f"Warning: No bins found for chromosome {chromosome}"
+            ) from error
 
         start_bin_idx = np.searchsorted(start_values, start, side="right") - 1
         end_bin_idx = np.searchsorted(end_values, end, side="left")
@@ -74,14 +67,77 @@ class PositionalEncoding(nn.Module):
         if start_bin_idx > end_bin_idx:
             raise ValueError("Start bin index is greater than end bin index.")
 
-        overlapping_bins = chrom_bins.iloc[start_bin_idx : end_bin_idx + 1]
-        if overlapping_bins.empty:
+        overlapping_bins = bin_idxs[start_bin_idx : end_bin_idx + 1]
+        if overlapping_bins.size == 0:
             raise ValueError(
                 "Warning: No bins found for range "
                 f"{start}-{end} on chromosome {chromosome}"
             )
 
-        return np.array(overlapping_bins.index)
+        return overlapping_bins
+
+    def get_batch_bin_indices(
+        self, chroms: List[str], starts: np.ndarray, ends: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the bin indices overlapping many intervals at once, flattened
+        into one array, along with the interval each bin belongs to."""
+        chroms = np.asarray(chroms)
+        starts = np.asarray(starts, dtype=np.int32)
+        ends = np.asarray(ends, dtype=np.int32)
+
+        bin_idxs, segments = [], []
+        for chromosome in pd.unique(chroms):
+            try:
+                start_values, end_values, chrom_idxs = self._chrom_bins[chromosome]
+            except KeyError as error:
+                raise ValueError(
+                    f"Warning: No bins found for chromosome {chromosome}"
+                ) from error
+
+            rows = np.flatnonzero(chroms == chromosome)
+            first = np.searchsorted(start_values, starts[rows], side="right") - 1
+            last = np.searchsorted(end_values, ends[rows], side="left")
+            last = np.minimum(last, len(chrom_idxs) - 1)
+            counts = last - first + 1
+            if (counts <= 0).any():
+                raise ValueError("Start bin index is greater than end bin index.")
+
+            # expand each [first, last] range into its bin positions
+            offsets = np.repeat(first - (np.cumsum(counts) - counts), counts)
+            bin_idxs.append(chrom_idxs[np.arange(counts.sum()) + offsets])
+            segments.append(np.repeat(rows, counts))
+
+        return np.concatenate(bin_idxs), np.concatenate(segments)
+
+    def forward_batch(
+        self,
+        chroms: List[str],
+        starts: np.ndarray,
+        ends: np.ndarray,
+        pooling: str = "average",
+    ) -> torch.Tensor:
+        """Return the pooled positional encodings for many intervals as an
+        [n_intervals, embedding_dim] tensor, with one embedding lookup and one
+        scatter reduction instead of a lookup per interval."""
+        reductions = {"average": "mean", "max": "amax"}
+        if pooling not in reductions:
+            raise ValueError("Pooling type not supported. Choose 'max' or 'average'.")
+
+        bin_idxs, segments = self.get_batch_bin_indices(
+            chroms=chroms, starts=starts, ends=ends
+        )
+        device = self.embedding.weight.device
+        bin_embeddings = self.embedding(torch.from_numpy(bin_idxs).to(device))
+        index = torch.from_numpy(segments).to(device).unsqueeze(1)
+
+        pooled = bin_embeddings.new_zeros(len(starts), self.embedding_dim)
+        return pooled.scatter_reduce(
+            0,
+            index.expand_as(bin_embeddings),
+            bin_embeddings,
+            reduce=reductions[pooling],
+            include_self=False,
+        )
 
     def pool_embedding(
         self, bin_embeddings: torch.Tensor, pooling: str = "average"
@@ -116,6 +172,23 @@ class PositionalEncoding(nn.Module):
 
         return self.pool_embedding(bin_embeddings).detach().numpy()
 
+    @staticmethod
+    def index_bins_by_chromosome(
+        bins_df: pd.DataFrame,
+    ) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Split the bins into per-chromosome (start, end, global bin index)
+        arrays, so lookups do not need to scan the whole bins dataframe.
+        Coordinates fit in int32, which halves the memory searched per lookup.
+        """
+        return {
+            chrom: (
+                np.ascontiguousarray(group["start"].to_numpy(dtype=np.int32)),
+                np.ascontiguousarray(group["end"].to_numpy(dtype=np.int32)),
+                group.index.to_numpy(dtype=np.int64),
+            )
+            for chrom, group in bins_df.groupby("chrom", sort=False, observed=True)
+        }
+
     @staticmethod
     def get_bins(chromsize_file: str, binsize: int) -> pd.DataFrame:
         """Get the bins for a given chromosome size file and bin size.
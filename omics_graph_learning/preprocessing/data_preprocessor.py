@@ -9,22 +9,38 @@ directories and symbolic linkes, parsing tissue-specific data, and adjusting
 file formatting."""
 
 
-from collections import defaultdict
-import contextlib
-import csv
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+from pathlib import Path
 import subprocess
-from typing import Dict, List, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from omics_graph_learning.preprocessing.interval_kernels import counts_per_million
+from omics_graph_learning.preprocessing.interval_kernels import merge_intervals
+from omics_graph_learning.preprocessing.interval_kernels import merge_intervals_mean
+from omics_graph_learning.preprocessing.interval_kernels import relabel_lines
 from omics_graph_learning.utils.common import _get_chromatin_loop_file
+from omics_graph_learning.utils.common import batch_symlink
+from omics_graph_learning.utils.common import cached_run
 from omics_graph_learning.utils.common import check_and_symlink
 from omics_graph_learning.utils.common import dir_check_make
+from omics_graph_learning.utils.common import get_physical_cores
 from omics_graph_learning.utils.common import time_decorator
 from omics_graph_learning.utils.config_handlers import ExperimentConfig
 from omics_graph_learning.utils.config_handlers import TissueConfig
 from omics_graph_learning.utils.constants import REGULATORY_ELEMENTS
 
+try:
+    import pyBigWig  # type: ignore
+except ImportError:
+    pyBigWig = None
+
 # import requests
 
 NODETYPES_LOCAL: List[str] = [
@@ -34,13 +50,33 @@ NODETYPES_LOCAL: List[str] = [
 ]  # local context filetypes
 
 
-def _mirna_ref(ref_file: str) -> Dict[str, List[str]]:
-    """Reference for miRNA target genes"""
-    mirnaref = defaultdict(list)
-    with open(ref_file) as f:
-        for line in csv.reader(f, delimiter="\t"):
-            mirnaref[line[3]].append(line[-1])
-    return mirnaref
+@functools.lru_cache(maxsize=4)
+def _parse_mirna_ref_cached(ref_path: str, mtime_ns: int) -> pd.DataFrame:
+    """Parse a miRNA reference once per path and modification time into two
+    columns, the miRNA (4th) and its target (last), using the pandas C
+    parser."""
+    with open(ref_path, "r") as f:
+        last_col = len(f.readline().split("\t")) - 1
+
+    ref = pd.read_csv(
+        ref_path,
+        sep="\t",
+        header=None,
+        usecols=[3, last_col],
+        dtype=str,
+        keep_default_na=False,
+        engine="c",
+    )
+    ref.columns = ["mirna", "target"]
+    return ref
+
+
+def _mirna_ref(ref_file: str) -> pd.DataFrame:
+    """Reference for miRNA target genes, one (mirna, target) pair per row in
+    file order. Repeat loads of an unchanged file are served from cache, so
+    callers must not modify the returned frame in place."""
+    ref_path = os.path.realpath(ref_file)
+    return _parse_mirna_ref_cached(ref_path, os.stat(ref_path).st_mtime_ns)
 
 
 class GenomeDataPreprocessor:
@@ -85,11 +121,16 @@ class GenomeDataPreprocessor:
         self,
         experiment_config: ExperimentConfig,
         tissue_config: TissueConfig,
+        sort_threads: Optional[int] = None,
+        sort_buffer: str = "25%",
+        sort_tmpdir: Optional[Union[str, Path]] = None,
     ) -> None:
-        """Initialize the class"""
+        """Initialize the class. sort_threads, sort_buffer, and sort_tmpdir set
+        the --parallel, -S, and -T options of every external sort; by default
+        all physical cores, a quarter of memory, and the unprocessed dir."""
         self.experiment_name = experiment_config.experiment_name
-        self.interaction_types = experiment_config.interaction_types
-        self.nodes = experiment_config.nodes
+        self.interaction_types = experiment_config.interaction_types or []
+        self.nodes = frozenset(experiment_config.nodes or ())
         self.attribute_references = experiment_config.attribute_references
         self.regulatory_schema = experiment_config.regulatory_schema
         self.root_dir = experiment_config.root_dir
@@ -107,14 +148,33 @@ class GenomeDataPreprocessor:
         self.shared_data_dir = self.root_dir / "shared_data"
         self.reg_dir = self.shared_data_dir / "regulatory_elements"
         self.tissue_dir = self.working_directory / self.tissue
+        self.local_dir = self.tissue_dir / "local"
+        self.interaction_dir = self.tissue_dir / "interaction"
+        self.unprocessed_dir = self.tissue_dir / "unprocessed"
         self.data_dir = self.root_dir / "raw_tissue_data" / self.tissue
+        self._tissue_links = {
+            node: (self.data_dir / file, self.unprocessed_dir / file)
+            for node, file in self.tissue_specific_nodes.items()
+            if file
+        }
+        self.sort_threads = sort_threads or get_physical_cores()
+        self.sort_buffer = sort_buffer
+        self.sort_tmpdir = Path(sort_tmpdir) if sort_tmpdir else self.unprocessed_dir
+
+        # decide which optional steps run once
+        self._do_crms = "crms" in self.nodes
+        self._do_tads = "tads" in self.nodes
+        self._do_loops = "loops" in self.nodes
+        self._do_superenhancers = "superenhancers" in self.nodes
+        self._do_tfbindingsites = "tfbindingsites" in self.nodes
+        self._do_mirna = "mirna" in self.interaction_types
 
         # make directories, link files, and download shared files if necessary
         self._make_directories()
         self._symlink_rawdata()
         # self._download_shared_files()
 
-        if "loops" in self.nodes:
+        if self._do_loops:
             self.loops = _get_chromatin_loop_file(
                 experiment_config=experiment_config, tissue_config=tissue_config
             )
@@ -123,88 +183,178 @@ class GenomeDataPreprocessor:
         """Make directories for processing"""
         dir_check_make(self.tissue_dir)
 
-        for directory in ["local", "interaction", "unprocessed"]:
-            dir_check_make(self.tissue_dir / directory)
+        for directory in [self.local_dir, self.interaction_dir, self.unprocessed_dir]:
+            dir_check_make(directory)
 
-    def _run_cmd(self, cmd: str) -> None:
-        """Simple wrapper for subprocess as options across this script are
-        constant"""
-        subprocess.run(cmd, stdout=None, shell=True)
+    def _run_cmd(
+        self, argv: List[str], outfile: Optional[Union[str, Path]] = None
+    ) -> None:
+        """Run a command directly, without forking an intermediate shell. If
+        outfile is given, stdout is redirected to it. Commands run in the C
+        locale so sorts compare bytes. Raises on failure."""
+        env = {**os.environ, "LC_ALL": "C"}
+        if outfile is None:
+            subprocess.run(argv, check=True, env=env)
+            return
+        with open(outfile, "w") as out:
+            subprocess.run(argv, stdout=out, check=True, env=env)
+
+    def _sort_argv(self, *args: str) -> List[str]:
+        """Build a sort command with the configured threads, memory buffer,
+        and temp directory. _run_cmd runs it in the C locale."""
+        return [
+            "sort",
+            f"--parallel={self.sort_threads}",
+            "-S",
+            self.sort_buffer,
+            "-T",
+            str(self.sort_tmpdir),
+            *args,
+        ]
 
     def _symlink_rawdata(self) -> None:
         """Make symlinks for tissue specific files in unprocessed folder"""
-        for file in self.tissue_specific_nodes.values():
-            check_and_symlink(
-                dst=self.tissue_dir / "unprocessed" / file,
-                src=self.data_dir / file,
-                boolean=True,
-            )
+        links = list(self._tissue_links.values())
 
         # make a symlink for mirna
-        if "mirna" in self.interaction_types:
-            check_and_symlink(
-                src=self.data_dir / self.interaction["mirna"],
-                dst=self.tissue_dir / "unprocessed" / self.interaction["mirna"],
-                boolean=True,
-            )
+        if self._do_mirna:
+            mirna = self.interaction["mirna"]
+            links.append((self.data_dir / mirna, self.unprocessed_dir / mirna))
+
+        batch_symlink(links, boolean=True)
 
     # def _download_shared_files(self) -> None:
     #     """Download shared local features if not already present"""
 
     #     def download(url: str, filename: str) -> None:
-    #         with open(filename, "wb") as file:
-    #             response = requests.get(url)
-    #             file.write(response.content)
-
-    #     if os.listdir(f"{self.root_dir}/local_feats") != self.shared:
-    #         for file in self.shared.values():
+    #         with requests.get(url, stream=True) as response, open(
+    #             filename, "wb"
+    #         ) as file:
+    #             for chunk in response.iter_content(chunk_size=1 << 20):
+    #                 file.write(chunk)
+
+    #     present = set(os.listdir(f"{self.root_dir}/shared_data/local_feats"))
+    #     for file in self.shared.values():
+    #         if file not in present:
     #             download(
     #                 f"https://raw.github.com/sciencesteveho/genome_graph_perturbation/raw/master/shared_files/local_feats/{file}",
     #                 f"{self.root_dir}/shared_data/local_feats/{file}",
     #             )
 
-    @time_decorator(print_args=True)
-    def _add_tad_id(self, bed: str) -> None:
-        """Add identification number to each TAD"""
-        cmd = f"awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $3, \"tad_\"NR}}' \
-            {self.tissue_dir}/unprocessed/{bed} \
-            > {self.tissue_dir}/local/tads_{self.tissue}.txt"
+    @staticmethod
+    def _relabel_bed(
+        src: Union[str, Path],
+        dst: Union[str, Path],
+        label: str,
+        number: bool = False,
+        name_with_coords: bool = False,
+        skip_header: bool = False,
+    ) -> None:
+        """Write the first three columns of a bed file with a new name column
+        in a single buffered pass. The name is `label`, `label_<line number>`
+        if number, or `chr_start_label` if name_with_coords. Constant and
+        numbered labels are written by a compiled kernel over raw blocks of the
+        file.
+        """
+        if not name_with_coords:
+            GenomeDataPreprocessor._relabel_bed_blocks(
+                src=src,
+                dst=dst,
+                label=label,
+                number=number,
+                skip_header=skip_header,
+            )
+            return
+
+        with open(src, "r", buffering=1 << 20) as infile, open(
+            dst, "w", buffering=1 << 20
+        ) as outfile:
+            if skip_header:
+                next(infile, None)
+            for line in infile:
+                chrom, start, end = line.rstrip("\n").split("\t", 3)[:3]
+                outfile.write(f"{chrom}\t{start}\t{end}\t{chrom}_{start}_{label}\n")
 
-        self._run_cmd(cmd)
+    @staticmethod
+    def _relabel_bed_blocks(
+        src: Union[str, Path],
+        dst: Union[str, Path],
+        label: str,
+        number: bool = False,
+        skip_header: bool = False,
+        block_size: int = 1 << 26,
+    ) -> None:
+        """Relabel a bed file with a constant or numbered name by reading it in
+        binary blocks cut at the last newline, so the per-line work happens in
+        `relabel_lines` instead of the interpreter.
+        """
+        label_bytes = np.frombuffer(label.encode(), dtype=np.uint8)
+        next_number = 1 if number else 0
+        with open(src, "rb", buffering=1 << 20) as infile, open(
+            dst, "wb", buffering=1 << 20
+        ) as outfile:
+            if skip_header:
+                infile.readline()
+            remainder = b""
+            while True:
+                block = infile.read(block_size)
+                if not block:
+                    break
+                block = remainder + block
+                cut = block.rfind(b"\n") + 1
+                remainder = block[cut:]
+                if cut:
+                    lines = np.frombuffer(block[:cut], dtype=np.uint8)
+                    outfile.write(relabel_lines(lines, label_bytes, next_number))
+                    if number:
+                        next_number += block.count(b"\n", 0, cut)
+            if remainder:
+                lines = np.frombuffer(remainder, dtype=np.uint8)
+                outfile.write(relabel_lines(lines, label_bytes, next_number))
 
     @time_decorator(print_args=True)
-    def _add_loop_id(self, bed: str) -> None:
-        """Add identification number to each chr loop"""
-        cmd = f"awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $6, \"loop_\"NR}}' \
-            {self.tissue_dir}/unprocessed/{bed} \
-            > {self.tissue_dir}/local/loops_{self.tissue}.txt"
+    def _add_tad_id(self, bed: str) -> None:
+        """Add identification number to each TAD"""
+        self._relabel_bed(
+            src=self.unprocessed_dir / bed,
+            dst=self.local_dir / f"tads_{self.tissue}.txt",
+            label="tad",
+            number=True,
+        )
 
     @time_decorator(print_args=True)
     def _superenhancers(self, bed: str) -> None:
         """Simple parser to remove superenhancer bed unneeded info"""
-        cmd = f" tail -n +2 {self.tissue_dir}/unprocessed/{bed} \
-            | awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $3, \"superenhancer\"}}' \
-            > {self.tissue_dir}/local/superenhancers_{self.tissue}.bed"
-
-        self._run_cmd(cmd)
+        self._relabel_bed(
+            src=self.unprocessed_dir / bed,
+            dst=self.local_dir / f"superenhancers_{self.tissue}.bed",
+            label="superenhancer",
+            skip_header=True,
+        )
 
     @time_decorator(print_args=True)
     def _tf_binding_sites(self, bed: str) -> None:
         """Parse tissue-specific transcription factor binding sites Vierstra et
         al., Nature, 2020.
         """
-        cmd = f"awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $3, \"footprint\"}}' {self.tissue_dir}/unprocessed/{bed} \
-            > {self.tissue_dir}/local/tfbindingsites_{self.tissue}.bed"
-        rename = f"awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $3, $1\"_\"$2\"_footprint\"}}' {self.tissue_dir}/unprocessed/{bed} \
-            > {self.tissue_dir}/unprocessed/tfbindingsites_ref.bed"
-        for cmds in [cmd, rename]:
-            self._run_cmd(cmds)
+        src = self.unprocessed_dir / bed
+        self._relabel_bed(
+            src=src,
+            dst=self.local_dir / f"tfbindingsites_{self.tissue}.bed",
+            label="footprint",
+        )
+        self._relabel_bed(
+            src=src,
+            dst=self.unprocessed_dir / "tfbindingsites_ref.bed",
+            label="footprint",
+            name_with_coords=True,
+        )
 
     def _liftover(
-        self, liftover: str, bed: str, liftover_chain: str, path: str
+        self, liftover: str, bed: str, liftover_chain: str, path: Path
     ) -> None:
         """Liftovers bed file, sorts it, and deletes the unlifted regions. The
-        command is a subprocess call and is set up like:
+        commands are run as subprocess calls and are set up like:
         
         ./liftOver \
             input.bed \
@@ -212,23 +362,26 @@ class GenomeDataPreprocessor:
             output.bed \
             unlifted.bed
             
-        bedtools sort -i output.bed > output_sorted.bed && \
-            mv output_sorted output.bed \
+        LC_ALL=C sort -k1,1 -k2,2n --parallel=N -S 25% -o output.bed output.bed \
             && rm unlifted.bed
             
-        Returns none, but creates an output file *path/bed_lifted*
+        Returns none, but creates an output file *path/bed_lifted*. Skipped if
+        the bed and chain are unchanged since the last liftover.
         """
-        cmd = f"{liftover} \
-            {path}/{bed} \
-            {liftover_chain} \
-            {path}/{bed}_lifted \
-            {path}/{bed}_unlifted \
-            && bedtools sort -i {path}/{bed}_lifted \
-            > {path}/{bed}_lifted_sorted \
-            && mv {path}/{bed}_lifted_sorted {path}/{bed}_lifted \
-            && rm {path}/{bed}_unlifted"
-
-        self._run_cmd(cmd)
+        lifted = f"{path}/{bed}_lifted"
+        unlifted = f"{path}/{bed}_unlifted"
+
+        def _lift() -> None:
+            """Liftover, sort, and remove the unlifted regions."""
+            self._run_cmd([liftover, f"{path}/{bed}", liftover_chain, lifted, unlifted])
+            self._run_cmd(self._sort_argv("-k1,1", "-k2,2n", "-o", lifted, lifted))
+            os.remove(unlifted)
+
+        cached_run(
+            inputs=[Path(path) / bed, Path(liftover_chain)],
+            outputs=[Path(lifted)],
+            function=_lift,
+        )
 
     @time_decorator(print_args=True)
     def _normalize_mirna(self, file: str) -> None:
@@ -248,40 +401,90 @@ class GenomeDataPreprocessor:
         # CPM normalization
         mirna = self._count_per_million(mirna)
 
-        # filter out miRNAs that are not in the reference and flatten list
-        active_mirna_gencode = (
-            mirna["gene"]
-            .apply(lambda x: mirnaref[x] if x in mirnaref and mirnaref[x] else [])
-            .tolist()
-        )
-        flattned_mirna = [item for sublist in active_mirna_gencode for item in sublist]
+        # keep targets of miRNAs in the reference, in miRNA then file order
+        active_mirna_gencode = mirna[["gene"]].merge(
+            mirnaref, left_on="gene", right_on="mirna", how="inner"
+        )["target"]
 
-        # write out to file
+        # write out to file in a single call
         with open(
-            f"{self.tissue_dir}/interaction/active_mirna_{self.tissue}.txt", "w"
+            self.interaction_dir / f"active_mirna_{self.tissue}.txt",
+            "w",
+            buffering=1 << 20,
         ) as f:
-            for item in flattned_mirna:
-                f.write("%s\n" % item)
+            f.write("".join(f"{gene}\n" for gene in active_mirna_gencode))
 
     @time_decorator(print_args=True)
-    def _combine_cpg_files(self, beds: List[str], path: str) -> None:
+    def _combine_cpg_files(self, beds: List[str], path: Path) -> None:
         """Combined methylation signal across CpGs and average by dividing by
-        the amount of files combined.
+        the amount of files combined. Files are concatenated and sorted in
+        memory, then merged with the mean of column 11 like `bedtools merge -c
+        11 -o mean`. The files are independent, so they are parsed in threads;
+        the C parser releases the GIL while tokenizing.
         """
-        cmd = f"cat {' '.join([f'{path}/{bed}' for bed in beds])} \
-                | sort -k1,1, -k2,2n \
-                | bedtools merge -i - -c 11 -o mean \
-                > {path}/merged_cpgs.bed"
 
-        self._run_cmd(cmd)
+        def _read_cpgs(bed: str) -> pd.DataFrame:
+            return pd.read_csv(
+                f"{path}/{bed}",
+                sep="\t",
+                header=None,
+                usecols=[0, 1, 2, 10],
+                dtype={0: str, 1: np.int32, 2: np.int32, 10: np.float64},
+                engine="c",
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(beds), get_physical_cores())
+        ) as executor:
+            cpgs = pd.concat(executor.map(_read_cpgs, beds), ignore_index=True)
+
+        # sorted codes keep the lexical chromosome order of `sort -k1,1`
+        codes, chroms = pd.factorize(cpgs[0], sort=True)
+        starts = cpgs[1].to_numpy()
+        order = np.lexsort((starts, codes))
+        merged_codes, merged_starts, merged_ends, merged_means = merge_intervals_mean(
+            codes[order],
+            starts[order],
+            cpgs[2].to_numpy()[order],
+            cpgs[10].to_numpy()[order],
+        )
+        pd.DataFrame(
+            {
+                "chrom": chroms[merged_codes],
+                "start": merged_starts,
+                "end": merged_ends,
+                "mean": merged_means,
+            }
+        ).to_csv(f"{path}/merged_cpgs.bed", sep="\t", header=False, index=False)
 
     @time_decorator(print_args=True)
-    def _bigwig_to_filtered_bedgraph(self, path: str, file: str) -> str:
-        """Convert bigwig to bedgraph file"""
-        convert_cmd = f"{self.reference_dir}/bigWigToBedGraph {path}/{file}.bigwig {path}/{file}.bedGraph"
-        filter_cmd = f"awk '$4 >= 0.8' {path}/{file}.bedGraph > {path}/{file}_gt80.bed"
-        for cmd in [convert_cmd, filter_cmd]:
-            self._run_cmd(cmd)
+    def _bigwig_to_filtered_bedgraph(self, path: Path, file: str) -> str:
+        """Convert bigwig to bedgraph file, keeping intervals with signal >=
+        0.8. Uses pyBigWig to filter while reading if it is installed,
+        otherwise bigWigToBedGraph and awk."""
+        outfile = f"{path}/{file}_gt80.bed"
+        if pyBigWig is not None:
+            bigwig = pyBigWig.open(f"{path}/{file}.bigwig")
+            try:
+                with open(outfile, "w", buffering=1 << 20) as out:
+                    for chrom in bigwig.chroms():
+                        out.writelines(
+                            f"{chrom}\t{start}\t{end}\t{value:g}\n"
+                            for start, end, value in bigwig.intervals(chrom) or ()
+                            if value >= 0.8
+                        )
+            finally:
+                bigwig.close()
+            return f"{file}_gt80.bed"
+
+        self._run_cmd(
+            [
+                f"{self.reference_dir}/bigWigToBedGraph",
+                f"{path}/{file}.bigwig",
+                f"{path}/{file}.bedGraph",
+            ]
+        )
+        self._run_cmd(["awk", "$4 >= 0.8", f"{path}/{file}.bedGraph"], outfile=outfile)
         return f"{file}_gt80.bed"
 
     @time_decorator(print_args=True)
@@ -294,8 +497,8 @@ class GenomeDataPreprocessor:
 
         # merge multiple cpg files if necessary
         if isinstance(bed, list):
-            self._combine_cpg_files(beds=bed, path=f"{self.tissue_dir}/unprocessed")
-            cpg_bed = "merged_cpgs"
+            self._combine_cpg_files(beds=bed, path=self.unprocessed_dir)
+            cpg_bed = "merged_cpgs.bed"
             cpg_percent_col = 4
         else:
             cpg_bed = bed
@@ -304,7 +507,7 @@ class GenomeDataPreprocessor:
         # if a roadmap file, convert
         if self.methylation["cpg_filetype"] == "roadmap":
             cpg_bed = self._bigwig_to_filtered_bedgraph(
-                path=f"{self.tissue_dir}/unprocessed",
+                path=self.unprocessed_dir,
                 file=cpg_bed.split(".bigwig")[0],
             )
 
@@ -314,96 +517,155 @@ class GenomeDataPreprocessor:
                 liftover=self.resources["liftover"],
                 bed=cpg_bed,
                 liftover_chain=self.resources["liftover_chain"],
-                path=f"{self.tissue_dir}/unprocessed",
+                path=self.unprocessed_dir,
             )
 
             # update cpg_bed to the lifted version
             cpg_bed = f"{cpg_bed}_lifted"
 
-        if self.methylation["cpg_filetype"] == "ENCODE":
-            filtered_file = f"{self.tissue_dir}/unprocessed/{cpg_bed}_gt80"
-            gt_gc = f"awk -v FS='\t' -v OFS='\t' '${cpg_percent_col} >= 80' {self.tissue_dir}/unprocessed/{bed} \
-                > {filtered_file}"
-            self._run_cmd(gt_gc)
-            final_bed = filtered_file
-        else:
-            final_bed = f"{self.tissue_dir}/unprocessed/{cpg_bed}"
-
-        bedtools_cmd = f"bedtools merge \
-                -i {final_bed} \
-                | awk -v FS='\t' -v OFS='\t' '{{print $1, $2, $3, \"cpg_methyl\"}}' \
-                > {self.tissue_dir}/local/cpg_{self.tissue}_parsed.bed"
+        # filter ENCODE cpgs by methylation percent, then merge in one pass
+        self._filter_and_merge_cpgs(
+            bed=self.unprocessed_dir / cpg_bed,
+            outfile=self.local_dir / f"cpg_{self.tissue}_parsed.bed",
+            percent_col=(
+                cpg_percent_col
+                if self.methylation["cpg_filetype"] == "ENCODE"
+                else None
+            ),
+        )
 
-        self._run_cmd(bedtools_cmd)
+    @staticmethod
+    def _filter_and_merge_cpgs(
+        bed: Path,
+        outfile: Path,
+        percent_col: Optional[int] = None,
+        min_percent: float = 80,
+    ) -> None:
+        """Keep CpGs with methylation percent >= min_percent in the 1-based
+        percent_col, if given, then merge overlapping or bookended CpGs and
+        label them as `cpg_methyl`. Replaces an awk | bedtools merge | awk
+        pipeline and its intermediate file.
+        """
+        usecols = [0, 1, 2] if percent_col is None else [0, 1, 2, percent_col - 1]
+        cpgs = pd.read_csv(
+            bed,
+            sep="\t",
+            header=None,
+            usecols=usecols,
+            dtype={0: "category", 1: np.int32, 2: np.int32},
+            engine="c",
+        )
+        if percent_col is not None:
+            cpgs = cpgs[cpgs[percent_col - 1] >= min_percent]
+
+        # renumber category codes by first appearance to keep the file order
+        category_codes = cpgs[0].cat.codes.to_numpy()
+        appearance = pd.unique(category_codes)
+        remap = np.empty(len(cpgs[0].cat.categories), dtype=np.int64)
+        remap[appearance] = np.arange(len(appearance))
+        codes = remap[category_codes]
+        chroms = cpgs[0].cat.categories[appearance]
+        starts = cpgs[1].to_numpy()
+        ends = cpgs[2].to_numpy()
+
+        # merging expects chr, start order
+        code_steps, start_steps = np.diff(codes), np.diff(starts)
+        if not np.all((code_steps > 0) | ((code_steps == 0) & (start_steps >= 0))):
+            order = np.lexsort((starts, codes))
+            codes, starts, ends = codes[order], starts[order], ends[order]
+
+        merged_codes, merged_starts, merged_ends = merge_intervals(codes, starts, ends)
+        pd.DataFrame(
+            {
+                "chrom": chroms[merged_codes],
+                "start": merged_starts,
+                "end": merged_ends,
+                "name": "cpg_methyl",
+            }
+        ).to_csv(outfile, sep="\t", header=False, index=False)
 
     @time_decorator(print_args=True)
     def prepare_data_files(self) -> None:
         """Pipeline to prepare all bedfiles!"""
 
+        links: List[Tuple[Path, Path]] = []
+
         ### Make symlinks for shared data files
         for file in self.local.values():
-            src = self.shared_data_dir / "local" / file
-            dst = self.tissue_dir / "local" / file
             if (
                 file in NODETYPES_LOCAL
                 and file in self.nodes
                 or file not in NODETYPES_LOCAL
             ):
-                check_and_symlink(
-                    src=src,
-                    dst=dst,
+                links.append(
+                    (self.shared_data_dir / "local" / file, self.local_dir / file)
                 )
 
         ### Make symlinks for histone marks
         for datatype in self.features:
-            check_and_symlink(
-                src=self.data_dir / self.features[datatype],
-                dst=self.tissue_dir / "local" / f"{datatype}_{self.tissue}.bed",
+            links.append(
+                (
+                    self.data_dir / self.features[datatype],
+                    self.local_dir / f"{datatype}_{self.tissue}.bed",
+                )
             )
 
         ### Make symlinks for regulatory data
         regulatory_elements = REGULATORY_ELEMENTS[self.regulatory_schema]
         for element in regulatory_elements:
             if regulatory_elements[element]:
-                check_and_symlink(
-                    src=self.reg_dir / regulatory_elements[element],
-                    dst=self.tissue_dir / "local" / f"{element}_{self.tissue}.bed",
+                links.append(
+                    (
+                        self.reg_dir / regulatory_elements[element],
+                        self.local_dir / f"{element}_{self.tissue}.bed",
+                    )
                 )
 
         ### Make symlink for cpg
-        src = self.data_dir / self.methylation["cpg"]
-        dst = self.tissue_dir / "unprocessed" / self.methylation["cpg"]
-        check_and_symlink(
-            src=src,
-            dst=dst,
+        links.append(
+            (
+                self.data_dir / self.methylation["cpg"],
+                self.unprocessed_dir / self.methylation["cpg"],
+            )
         )
+        batch_symlink(links)
 
-        if self.nodes is not None:
-            if "crms" in self.nodes:
-                check_and_symlink(
-                    src=self.data_dir / self.tissue_specific_nodes["crms"],
-                    dst=self.tissue_dir / "local" / f"crms_{self.tissue}.bed",
-                )
-            if "tads" in self.nodes:
-                self._add_tad_id(self.tissue_specific_nodes["tads"])
-            if "loops" in self.nodes:
-                check_and_symlink(
-                    src=self.tissue_specific_nodes["loops"],
-                    dst=self.tissue_dir / "local" / f"loops_{self.tissue}.bed",
-                )
-            if "loops" in self.nodes:
-                self._add_loop_id(self.loops)
-            if "superenhancers" in self.nodes:
-                self._superenhancers(self.tissue_specific_nodes["super_enhancer"])
-            if "tfbindingsites" in self.nodes:
-                self._tf_binding_sites(self.tissue_specific_nodes["tf_binding"])
+        # steps below read and write independent files, so they run in parallel
+        steps: List[Tuple[Callable[..., None], Any]] = []
+        if self._do_crms:
+            check_and_symlink(
+                src=self._tissue_links["crms"][0],
+                dst=self.local_dir / f"crms_{self.tissue}.bed",
+            )
+        if self._do_tads:
+            steps.append((self._add_tad_id, self.tissue_specific_nodes["tads"]))
+        if self._do_loops:
+            check_and_symlink(
+                src=self.tissue_specific_nodes["loops"],
+                dst=self.local_dir / f"loops_{self.tissue}.bed",
+            )
+        if self._do_superenhancers:
+            steps.append(
+                (self._superenhancers, self.tissue_specific_nodes["super_enhancer"])
+            )
+        if self._do_tfbindingsites:
+            steps.append(
+                (self._tf_binding_sites, self.tissue_specific_nodes["tf_binding"])
+            )
 
-        self._merge_cpg(self.methylation["cpg"])
+        steps.append((self._merge_cpg, self.methylation["cpg"]))
 
         # parse active miRNAs from raw data
-        if "mirna" in self.interaction_types:
-            mirna_file = self.tissue_dir / "unprocessed" / self.interaction["mirna"]
-            self._normalize_mirna(mirna_file)
+        if self._do_mirna:
+            mirna_file = self.unprocessed_dir / self.interaction["mirna"]
+            steps.append((self._normalize_mirna, mirna_file))
+
+        with ProcessPoolExecutor(
+            max_workers=min(len(steps), get_physical_cores())
+        ) as executor:
+            futures = [executor.submit(step, arg) for step, arg in steps]
+            for future in as_completed(futures):
+                future.result()
 
     @staticmethod
     def _count_per_million(df: pd.DataFrame) -> pd.DataFrame:
@@ -412,8 +674,8 @@ class GenomeDataPreprocessor:
         quantifications.
         """
         try:
-            total = df["count"].sum()
+            counts = df["count"].to_numpy(dtype=np.float64)
         except KeyError as e:
             raise ValueError("DataFrame must have a column named 'count'") from e
-        df["cpm"] = (df["count"] / total) * 1e6
-        return df[df["cpm"] >= 3]
+        cpm, keep = counts_per_million(counts, 3.0)
+        return df.loc[keep].assign(cpm=cpm[keep])
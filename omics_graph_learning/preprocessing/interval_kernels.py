@@ -0,0 +1,168 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""Compiled kernels for simple interval operations on bed files that are
+already loaded as numpy columns, and other small per-row passes of the
+preprocessor. Chromosomes are passed as integer codes (e.g.
+from `pd.factorize`) so the kernels only compare integers. Line-level kernels
+work on raw bytes viewed as uint8 arrays. Kernels are JIT compiled by numba on
+first use and cached to disk."""
+
+
+from typing import Tuple
+
+from numba import njit  # type: ignore
+import numpy as np
+
+
+@njit(cache=True)
+def merge_intervals(
+    chroms: np.ndarray, starts: np.ndarray, ends: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge overlapping or bookended intervals of a sorted bed, matching
+    `bedtools merge` with default options."""
+    n_rows = starts.shape[0]
+    out_chroms = np.empty(n_rows, dtype=chroms.dtype)
+    out_starts = np.empty(n_rows, dtype=starts.dtype)
+    out_ends = np.empty(n_rows, dtype=ends.dtype)
+    if n_rows == 0:
+        return out_chroms, out_starts, out_ends
+
+    count = 0
+    cur_chrom, cur_start, cur_end = chroms[0], starts[0], ends[0]
+    for row in range(1, n_rows):
+        if chroms[row] != cur_chrom or starts[row] > cur_end:
+            out_chroms[count] = cur_chrom
+            out_starts[count] = cur_start
+            out_ends[count] = cur_end
+            count += 1
+            cur_chrom, cur_start, cur_end = chroms[row], starts[row], ends[row]
+        elif ends[row] > cur_end:
+            cur_end = ends[row]
+
+    out_chroms[count] = cur_chrom
+    out_starts[count] = cur_start
+    out_ends[count] = cur_end
+    count += 1
+    return out_chroms[:count], out_starts[:count], out_ends[:count]
+
+
+@njit(cache=True)
+def merge_intervals_mean(
+    chroms: np.ndarray, starts: np.ndarray, ends: np.ndarray, values: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Merge overlapping or bookended intervals of a sorted bed and average
+    `values` over each merged interval, matching `bedtools merge -o mean`."""
+    n_rows = starts.shape[0]
+    out_chroms = np.empty(n_rows, dtype=chroms.dtype)
+    out_starts = np.empty(n_rows, dtype=starts.dtype)
+    out_ends = np.empty(n_rows, dtype=ends.dtype)
+    out_means = np.empty(n_rows, dtype=np.float64)
+    if n_rows == 0:
+        return out_chroms, out_starts, out_ends, out_means
+
+    count = 0
+    cur_chrom, cur_start, cur_end = chroms[0], starts[0], ends[0]
+    total, n_values = float(values[0]), 1
+    for row in range(1, n_rows):
+        if chroms[row] != cur_chrom or starts[row] > cur_end:
+            out_chroms[count] = cur_chrom
+            out_starts[count] = cur_start
+            out_ends[count] = cur_end
+            out_means[count] = total / n_values
+            count += 1
+            cur_chrom, cur_start, cur_end = chroms[row], starts[row], ends[row]
+            total, n_values = float(values[row]), 1
+        else:
+            if ends[row] > cur_end:
+                cur_end = ends[row]
+            total += values[row]
+            n_values += 1
+
+    out_chroms[count] = cur_chrom
+    out_starts[count] = cur_start
+    out_ends[count] = cur_end
+    out_means[count] = total / n_values
+    count += 1
+    return out_chroms[:count], out_starts[:count], out_ends[:count], out_means[:count]
+
+
+@njit(cache=True)
+def relabel_lines(
+    buffer: np.ndarray, label: np.ndarray, first_number: int = 0
+) -> np.ndarray:
+    """Keep the first three tab-separated columns of each line in a block of
+    bed text and append `label` as the fourth, like `awk '{print $1, $2, $3,
+    label}'`. If first_number is positive, lines are named `label_<n>` counting
+    up from it, like `label"_"NR`. Both arrays are uint8 views of bytes."""
+    n_bytes = buffer.shape[0]
+    n_lines = 1
+    for idx in range(n_bytes):
+        if buffer[idx] == 10:
+            n_lines += 1
+    name_width = label.shape[0] + (21 if first_number > 0 else 0)
+    out = np.empty(n_bytes + n_lines * (name_width + 2), dtype=np.uint8)
+    digits = np.empty(20, dtype=np.uint8)
+
+    pos = 0
+    idx = 0
+    number = first_number
+    while idx < n_bytes:
+        tabs = 0
+        while idx < n_bytes and buffer[idx] != 10:
+            if buffer[idx] == 9:
+                tabs += 1
+                if tabs == 3:
+                    break
+            out[pos] = buffer[idx]
+            pos += 1
+            idx += 1
+        while idx < n_bytes and buffer[idx] != 10:
+            idx += 1
+        out[pos] = 9
+        pos += 1
+        for char in label:
+            out[pos] = char
+            pos += 1
+        if first_number > 0:
+            out[pos] = 95  # "_"
+            pos += 1
+            n_digits = 0
+            value = number
+            while True:
+                digits[n_digits] = 48 + value % 10
+                n_digits += 1
+                value //= 10
+                if value == 0:
+                    break
+            for digit in range(n_digits - 1, -1, -1):
+                out[pos] = digits[digit]
+                pos += 1
+            number += 1
+        out[pos] = 10
+        pos += 1
+        idx += 1
+    return out[:pos]
+
+
+@njit(cache=True)
+def counts_per_million(
+    counts: np.ndarray, min_cpm: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalize counts to counts per million and flag rows with CPM >=
+    min_cpm, summing and scaling in two passes without temporaries. If every
+    count is zero, CPM is zero and no row is kept."""
+    total = 0.0
+    for count in counts:
+        total += count
+
+    cpm = np.zeros(counts.shape[0], dtype=np.float64)
+    keep = np.zeros(counts.shape[0], dtype=np.bool_)
+    if total == 0:
+        return cpm, keep
+
+    for idx in range(counts.shape[0]):
+        cpm[idx] = (counts[idx] / total) * 1e6
+        keep[idx] = cpm[idx] >= min_cpm
+    return cpm, keep
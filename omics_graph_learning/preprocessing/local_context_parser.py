@@ -8,21 +8,25 @@ window (i.e. 5kb). Additionally, node features are processed here as they also
 derive from the local context datatypes."""
 
 
-from itertools import repeat
-from multiprocessing import Pool
+from concurrent.futures import as_completed
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 import os
 from pathlib import Path
 import pickle
+import shutil
 import subprocess
 from subprocess import PIPE
-from subprocess import Popen
 from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
+import pandas as pd
+import psutil  # type: ignore
 from pybedtools import BedTool  # type: ignore
-from pybedtools.featurefuncs import extend_fields  # type: ignore
+import torch
 
 from omics_graph_learning.positional_encoding import PositionalEncoding
-from omics_graph_learning.utils.common import _chk_file_and_run
+from omics_graph_learning.utils.common import cached_run
 from omics_graph_learning.utils.common import dir_check_make
 from omics_graph_learning.utils.common import genes_from_gencode
 from omics_graph_learning.utils.common import get_physical_cores
@@ -49,15 +53,15 @@ class LocalContextParser:
     _prepare_local_features:
         Creates a dict of local context datatypes and their bedtools objects.
     _process_bedcollection:
-        Process a collection of bedfiles by sorting then adding a window (slop)
-        around each feature.
+        Process a collection of bedfiles by adding a window (slop) around each
+        feature.
     _bed_intersect:
         Function to intersect a slopped bed entry with all other node types.
     _aggregate_attributes:
         For each node of a node_type get their overlap with gene windows then
         aggregate total nucleotides, gc content, and all other attributes.
     _generate_edges:
-        Unix concatenate and sort each edge file.
+        Unix merge the presorted edge files.
     _save_node_attributes:
         Save attributes for all node entries.
     parse_context_data:
@@ -66,7 +70,6 @@ class LocalContextParser:
     # Helpers
         ATTRIBUTES -- list of node attribute types
         DIRECT -- list of datatypes that only get direct overlaps, no slop
-        ALL_CONCATENATED_FILE -- name of concatenated file
         SORTED_CONCATENATED_FILE -- name of sorted concatenated file
 
     Examples:
@@ -81,7 +84,6 @@ class LocalContextParser:
     """
 
     # var helpers
-    all_concatenated_file = "all_concat.bed"
     sorted_concatenated_file = "all_concat_sorted.bed"
 
     # list helpers
@@ -91,6 +93,13 @@ class LocalContextParser:
     # helper for CPU cores
     cores = get_physical_cores()
 
+    # rough peak memory of a worker, as a multiple of its largest input bed
+    memory_per_input_byte = 6
+
+    # read buffer for bedtools intersect, kept modest as many intersects run
+    # concurrently
+    iobuf = "128M"
+
     def __init__(
         self,
         experiment_config: ExperimentConfig,
@@ -100,6 +109,7 @@ class LocalContextParser:
         """Initialize the class"""
         self.bedfiles = bedfiles
         self.blacklist = experiment_config.blacklist
+        self.blacklist_file = experiment_config.blacklist
         self.chromfile = experiment_config.chromfile
         self.experiment_name = experiment_config.experiment_name
         self.fasta = experiment_config.fasta
@@ -113,9 +123,10 @@ class LocalContextParser:
         self.tissue = tissue_config.resources["tissue"]
         self.tss = tissue_config.local["tss"]
 
-        self.node_processes = len(self.nodes) + 1
         self._set_directories()
+        self._set_sort_command()
         self._prepare_bed_references()
+        self._set_worker_counts()
 
         # make directories
         self._make_directories()
@@ -130,6 +141,25 @@ class LocalContextParser:
         self.edge_dir = self.parse_dir / "edges"
         self.intermediate_dir = self.parse_dir / "intermediate"
         self.intermediate_sorted = self.intermediate_dir / "sorted"
+        self.chromosome_dir = self.intermediate_dir / "chromosomes"
+
+        # sorted attribute beds, shared by every node type during aggregation
+        self.attribute_beds = {
+            attribute: self.intermediate_sorted / f"{attribute}.bed"
+            for attribute in ATTRIBUTES
+        }
+
+    def _set_sort_command(self) -> None:
+        """Set the base sort command shared by every shell pipeline. Temp files
+        are spilled to the intermediate directory and compressed with zstd
+        when it is available."""
+        compress = "--compress-program=zstd" if shutil.which("zstd") else ""
+        self.sort_cmd = f"LC_ALL=C sort {compress} -T {self.intermediate_dir}"
+
+    def _sort(self, concurrent: int = 1) -> str:
+        """Return the sort command with --parallel set to an even share of the
+        cores, where `concurrent` is the number of sorts that may run at once."""
+        return f"{self.sort_cmd} --parallel={max(1, self.cores // concurrent)}"
 
     def _prepare_bed_references(
         self,
@@ -142,6 +172,24 @@ class LocalContextParser:
         )
         self.blacklist = BedTool(self.blacklist).sort().saveas()  # type: ignore
 
+    def _set_worker_counts(self) -> None:
+        """Size worker pools by available memory as well as cores, so that
+        workers holding large beds do not push the node into swap or OOM."""
+        biggest = max(
+            (os.path.getsize(self.local_dir / bed) for bed in self.bedfiles),
+            default=0,
+        )
+        memory_bound = int(
+            psutil.virtual_memory().available
+            // max(biggest * self.memory_per_input_byte, 1)
+        )
+        self.node_processes = max(1, min(len(self.nodes) + 1, memory_bound))
+        self.attribute_processes = max(1, min(self.cores, memory_bound))
+        logger.info(
+            f"Using {self.node_processes} node processes and "
+            f"{self.attribute_processes} attribute workers."
+        )
+
     def _make_directories(self) -> None:
         """Directories for parsing genomic bedfiles into graph edges and nodes"""
         dir_check_make(self.parse_dir)
@@ -151,6 +199,7 @@ class LocalContextParser:
             "attributes",
             "intermediate/slopped",
             "intermediate/sorted",
+            "intermediate/chromosomes",
         ]:
             dir_check_make(self.parse_dir / directory)
 
@@ -170,42 +219,54 @@ class LocalContextParser:
     def parse_context_data(self) -> None:
         """Parse local genomic data into graph edges."""
         # process windows and renaming
-        with Pool(processes=self.node_processes) as pool:
+        with ProcessPoolExecutor(max_workers=self.node_processes) as executor:
+            futures = [
+                executor.submit(self._prepare_local_features, bed)
+                for bed in self.bedfiles
+            ]
             bedcollection_flat = dict(
-                pool.starmap(
-                    self._prepare_local_features, [(bed,) for bed in self.bedfiles]
-                )
+                future.result() for future in as_completed(futures)
             )
 
-        # sort and extend windows according to FEAT_WINDOWS
-        bedcollection_sorted, bedcollection_slopped = self.process_bedcollection(
+        # extend windows according to FEAT_WINDOWS
+        # intermediate sorted and slopped files are written in place
+        _, bedcollection_slopped = self.process_bedcollection(
             bedcollection=bedcollection_flat,
             chromfile=self.chromfile,
             feat_window=self.feat_window,
         )
 
-        # save intermediate files
-        self._save_intermediate(bedcollection_sorted, folder="sorted")
-        self._save_intermediate(bedcollection_slopped, folder="slopped")
-
-        # pre-concatenate to save time
+        # pre-concatenate to save time, sharding the concatenated stream by
+        # chromosome once, so each node type only rescans the chromosomes it
+        # intersects
         all_files = self.intermediate_sorted / "all_files_concatenated.bed"
-        self._pre_concatenate_all_files(all_files, bedcollection_slopped)
+        chromosomes = self._pre_concatenate_all_files(all_files, bedcollection_slopped)
 
         # perform intersects across all feature types - one process per nodetype
-        with Pool(processes=self.node_processes) as pool:
-            pool.starmap(self._bed_intersect, zip(self.nodes, repeat(all_files)))
+        with ProcessPoolExecutor(max_workers=self.node_processes) as executor:
+            futures = [
+                executor.submit(self._bed_intersect, node, chromosomes)
+                for node in self.nodes
+            ]
+            for future in as_completed(futures):
+                future.result()
 
-        # get size and all attributes - one process per nodetype
-        with Pool(processes=self.cores) as pool:
-            pool.map(self._aggregate_attributes, ["basenodes"] + self.nodes)
+        # get size and all attributes - one thread per nodetype, as the work is
+        # done by bedtools subprocesses
+        with ThreadPoolExecutor(max_workers=self.attribute_processes) as executor:
+            list(executor.map(self._aggregate_attributes, ["basenodes"] + self.nodes))
 
         # parse edges into individual files
         self._generate_edges()
 
         # save node attributes as reference for later - one process per nodetype
-        with Pool(processes=self.cores) as pool:
-            pool.map(self._save_node_attributes, ["basenodes"] + self.nodes)
+        with ProcessPoolExecutor(max_workers=self.attribute_processes) as executor:
+            futures = [
+                executor.submit(self._save_node_attributes, node)
+                for node in ["basenodes"] + self.nodes
+            ]
+            for future in as_completed(futures):
+                future.result()
 
         # cleanup
         self._cleanup_edge_files()
@@ -218,45 +279,39 @@ class LocalContextParser:
         """
         Creates a dict of local context datatypes and their bedtools objects.
         Renames features if necessary. Intersects each bed to get only features
-        that do not intersect ENCODE blacklist regions.
+        that do not intersect ENCODE blacklist regions. Every step after the
+        initial sort preserves order, so the returned bed is sorted. The
+        blacklist filter pipes straight into the rename (or cut), so the only
+        file written is the result in the intermediate sorted directory.
         """
 
-        def rename_feat_chr_start(feature: Any) -> str:
-            """Add chr, start to feature name
-            Cpgislands add prefix to feature names  # enhancers,
-            Histones add an additional column
-            """
-            simple_rename = ["cpgislands", "crms", "superenhancers", "tfbindingsites"]
-            if prefix in simple_rename:
-                # feature = extend_fields(feature, 4)
-                feature[3] = f"{feature[0]}_{feature[1]}_{prefix}"
-            else:
-                # ensure feat does not already have chr_start
-                parts = feature[3].split("_")
-                if (
-                    len(parts) >= 3
-                    and parts[0] == feature[0]
-                    and parts[1] == feature[1]
-                ):
-                    return feature
-                feature[3] = f"{feature[0]}_{feature[1]}_{feature[3]}"
-            return feature
-
-        # prepare data as pybedtools objects and intersect -v against blacklist
-        local_bed = BedTool(self.local_dir / bed).sort()
-        ab = self._remove_blacklist_and_alt_configs(
-            bed=local_bed, blacklist=self.blacklist
-        )
-
-        # rename features if necessary and only keep coords
         prefix = bed.split("_")[0].lower()
-        if prefix in self.nodes and prefix != "gencode":
-            result = ab.each(rename_feat_chr_start).cut([0, 1, 2, 3]).saveas()
-            prepared_bed = BedTool(str(result), from_string=True)
-        else:
-            prepared_bed = ab.cut([0, 1, 2, 3])
+        prepared = self.intermediate_sorted / f"{prefix}.bed"
+        rename = prefix in self.nodes and prefix != "gencode"
+
+        def _prepare() -> None:
+            """Filter, rename, and write the prepared bed."""
+            # prepare data as pybedtools objects and intersect -v against
+            # blacklist, then rename features if necessary and only keep coords
+            local_bed = BedTool(self.local_dir / bed).sort()
+            self._remove_blacklist_and_alt_configs(
+                bed=local_bed,
+                blacklist=self.blacklist,
+                outfile=prepared,
+                post_filter=(
+                    self._rename_feat_chr_start(prefix=prefix)
+                    if rename
+                    else "cut -f1-4"
+                ),
+            )
 
-        return prefix, prepared_bed
+        cached_run(
+            inputs=[self.local_dir / bed, self.blacklist_file],
+            outputs=[prepared],
+            function=_prepare,
+            params=(prefix, rename),
+        )
+        return prefix, BedTool(prepared)
 
     @time_decorator(print_args=True)
     def process_bedcollection(
@@ -265,14 +320,14 @@ class LocalContextParser:
         chromfile: str,
         feat_window: int,
     ) -> Tuple[Dict[str, BedTool], Dict[str, BedTool]]:
-        """Process bedfiles by sorting then adding a window (slop) around each
-        feature.
+        """Process bedfiles by adding a window (slop) around each feature.
+        Prepared features are already sorted, as they are derived from a sorted
+        bed by order-preserving filters, so they are returned as is.
         """
-        bedcollection_sorted = self._sort_bedcollection(bedcollection)
         bedcollection_slopped = self._slop_bedcollection(
             bedcollection, chromfile, feat_window
         )
-        return bedcollection_sorted, bedcollection_slopped
+        return bedcollection, bedcollection_slopped
 
     def _slop_bedcollection(
         self,
@@ -282,7 +337,12 @@ class LocalContextParser:
     ) -> Dict[str, BedTool]:
         """Slop bedfiles that are not 3D chromatin files."""
         return {
-            key: self._slop_and_keep_original(value, chromfile, feat_window)
+            key: self._slop_and_keep_original(
+                bedfile=value,
+                chromfile=chromfile,
+                feat_window=feat_window,
+                outfile=self.intermediate_dir / "slopped" / f"{key}.bed",
+            )
             for key, value in bedcollection.items()
             if key not in ATTRIBUTES + self.direct
         }
@@ -291,57 +351,96 @@ class LocalContextParser:
     def _bed_intersect(
         self,
         node_type: str,
-        all_files: str,
+        chromosomes: List[str],
     ) -> None:
         """Slopped nodes are intersected with all other node types as a simple
         and fast way to generate edges. Special instances are 3d chromatin based
-        nodes, which require a direct intersect instead of a slop.
+        nodes, which require a direct intersect instead of a slop. Intersects
+        are run per chromosome shard in parallel.
 
-        Edge files are deduplicated and saved to the edge directory.
+        Each shard is deduplicated and sorted on the whole line as it is
+        written. Concatenating shards in chromosome name order then yields an
+        edge file sorted on the whole line, which is saved to the edge
+        directory without another sort.
         """
         logger.info(f"starting combinations {node_type}")
 
         def _unix_intersect(node_type: str, type: Optional[str] = None) -> None:
             """Perform a bed intersect using shell, which can be faster than
             pybedtools for large files."""
+            # drop self-overlaps, where both entries are identical
+            dedup = "$1 != $5 || $2 != $6 || $3 != $7 || $4 != $8"
             if type == "direct":
                 folder = "sorted"
-                cut_cmd = ""
+                cut_cmd = f" | awk -v FS='\t' -v OFS='\t' '{dedup}'"
             else:
                 folder = "slopped"
-                cut_cmd = " | cut -f5,6,7,8,9,10,11,12"
-
-            final_cmd = f"bedtools intersect \
-                -wa \
-                -wb \
-                -sorted \
-                -a {self.intermediate_dir}/{folder}/{node_type}.bed \
-                -b {all_files}"
-
-            with open(self.edge_dir / f"{node_type}.bed", "w") as outfile:
-                subprocess.run(final_cmd + cut_cmd, stdout=outfile, shell=True)
-            outfile.close()
-
-        def _add_distance(feature: Any) -> str:
-            """Add distance as [8]th field to each overlap interval"""
-            feature = extend_fields(feature, 9)
-            feature[8] = max(int(feature[1]), int(feature[5])) - min(
-                int(feature[2]), int(feature[5])
+                # keep the original entries, drop self-overlaps, and add the
+                # distance between the two features as the 9th field
+                cut_cmd = (
+                    " | cut -f5,6,7,8,9,10,11,12"
+                    " | awk -v FS='\t' -v OFS='\t' "
+                    f"'{dedup} "
+                    "{d_start = ($2 > $6) ? $2 : $6; "
+                    "d_end = ($3 < $6) ? $3 : $6; "
+                    "print $0, d_start - d_end}'"
+                )
+
+            node_chromosomes = set(
+                self._split_by_chromosome(
+                    bedfile=self.intermediate_dir / folder / f"{node_type}.bed",
+                    prefix=node_type,
+                )
             )
-            return feature
 
-        if node_type in self.direct:
-            _unix_intersect(node_type, type="direct")
-            self._filter_duplicate_bed_entries(
-                BedTool(self.edge_dir / f"{node_type}.bed")
-            ).sort().saveas(self.edge_dir / f"{node_type}_dupes_removed")
+            threads = max(1, self.cores // self.node_processes)
+            sort_cmd = self._sort(concurrent=self.node_processes * threads)
+
+            def _intersect_chromosome(chromosome: str) -> Path:
+                """Intersect, deduplicate, and sort a single chromosome shard."""
+                shard = self.edge_dir / f"{node_type}.{chromosome}.bed"
+                final_cmd = f"bedtools intersect \
+                    -wa \
+                    -wb \
+                    -sorted \
+                    -iobuf {self.iobuf} \
+                    -a {self.chromosome_dir}/{node_type}.{chromosome}.bed \
+                    -b {self.chromosome_dir}/all.{chromosome}.bed"
+                self._run_cmd(f"{final_cmd}{cut_cmd} | {sort_cmd} -u -o {shard}")
+                return shard
+
+            shared = sorted(chrom for chrom in chromosomes if chrom in node_chromosomes)
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                shards = list(executor.map(_intersect_chromosome, shared))
+
+            with open(self.edge_dir / f"{node_type}_dupes_removed", "wb") as outfile:
+                for shard in shards:
+                    with open(shard, "rb") as infile:
+                        shutil.copyfileobj(infile, outfile)
+                    shard.unlink()
+
+        _unix_intersect(node_type, type="direct" if node_type in self.direct else None)
+
+    def _split_by_chromosome(
+        self, bedfile: Path, prefix: str, source_cmd: Optional[str] = None
+    ) -> List[str]:
+        """Shard a sorted bedfile into one file per chromosome, named
+        {prefix}.{chr}.bed, and return the chromosomes in file order. If
+        source_cmd is given, its output is written to bedfile and sharded in
+        the same pass instead of reading bedfile back."""
+        for stale in self.chromosome_dir.glob(f"{prefix}.*.bed"):
+            stale.unlink()
+
+        split_cmd = f"awk -v FS='\t' \
+            -v shard={self.chromosome_dir}/{prefix} \
+            '{{print > (shard\".\"$1\".bed\")}} \
+            $1 != last {{print $1; last = $1}}'"
+        if source_cmd:
+            cmd = f"{source_cmd} | tee {bedfile} | {split_cmd}"
         else:
-            _unix_intersect(node_type)
-            self._filter_duplicate_bed_entries(
-                BedTool(self.edge_dir / f"{node_type}.bed")
-            ).each(_add_distance).saveas().sort().saveas(
-                self.edge_dir / f"{node_type}_dupes_removed"
-            )
+            cmd = f"{split_cmd} {bedfile}"
+        split = self._run_cmd(cmd, stdout=PIPE, text=True)
+        return split.stdout.split()
 
     @time_decorator(print_args=True)
     def _aggregate_attributes(self, node_type: str) -> None:
@@ -351,91 +450,134 @@ class LocalContextParser:
         ref_file = self._reference_nodes_for_feature_aggregation(node_type)
 
         # aggregate
-        for attribute in ATTRIBUTES:
-            save_file = (
-                self.attribute_dir / attribute / f"{node_type}_{attribute}_percentage"
-            )
-            logger.info(f"Processing {attribute} for {node_type}")
-            self._group_attribute(ref_file, attribute, save_file)
+        logger.info(f"Processing gc for {node_type}")
+        self._group_gc(ref_file, node_type)
+        logger.info(f"Processing remaining attributes for {node_type}")
+        self._group_attributes(ref_file, node_type)
 
     def _reference_nodes_for_feature_aggregation(self, node_type: str) -> BedTool:
-        """Prepare node_type reference for aggregating attributes"""
-
-        def add_size(feature: Any) -> str:
-            """Add size as a field to the bedtool object"""
-            feature = extend_fields(feature, 5)
-            feature[4] = feature.end - feature.start
-            return feature
-
-        return (
-            BedTool(self.intermediate_sorted / f"{node_type}.bed")
-            .filter(lambda x: "alt" not in x[0])
-            .each(add_size)
-            .sort()
-            .saveas()
+        """Prepare node_type reference for aggregating attributes. The reference
+        is sorted on the full (chr, start, end, name) key, which every
+        downstream tool preserves."""
+        ref_file = self.attribute_dir / f"{node_type}_ref.bed"
+        cmd = f"awk -v FS='\t' -v OFS='\t' '$1 !~ /alt/ {{$5 = $3 - $2; print}}' \
+            {self.intermediate_sorted}/{node_type}.bed \
+            | {self._sort(self.attribute_processes)} -k1,1 -k2,2n -k3,3n -k4,4 \
+            > {ref_file}"
+        cached_run(
+            inputs=[self.intermediate_sorted / f"{node_type}.bed"],
+            outputs=[ref_file],
+            function=lambda: self._run_cmd(cmd),
+        )
+        return BedTool(ref_file)
+
+    def _attribute_save_file(self, node_type: str, attribute: str) -> Path:
+        """Path to the aggregated attribute file for a node type."""
+        return self.attribute_dir / attribute / f"{node_type}_{attribute}_percentage"
+
+    def _group_gc(self, ref_file: BedTool, node_type: str) -> None:
+        """Get total nucleotides and gc content, streamed through a single
+        bedtools pipeline straight to its save file. `bedtools nuc` and
+        `groupby` keep the order of the reference."""
+        cmd = f"bedtools nuc -fi {self.fasta} -bed {ref_file.fn} \
+            | awk -v FS='\t' -v OFS='\t' \
+                '!/^#/ {{print $1, $2, $3, $4, $5, $9 + $10}}' \
+            | bedtools groupby -g 1,2,3,4 -c 5,6 -o sum \
+            > {self._attribute_save_file(node_type, 'gc')}"
+        cached_run(
+            inputs=[ref_file.fn, self.fasta],
+            outputs=[self._attribute_save_file(node_type, "gc")],
+            function=lambda: self._run_cmd(cmd),
         )
 
-    def _group_attribute(
-        self, ref_file: BedTool, attribute: str, save_file: Path
-    ) -> None:
-        """Get overlap with gene windows then aggregate total nucleotides, gc
-        content, and all other attributes.
+    def _group_attributes(self, ref_file: BedTool, node_type: str) -> None:
+        """Get overlap with every remaining attribute in a single pass over the
+        reference. One `bedtools intersect -sorted -wao` against all attribute
+        beds (labelled with -names) is split by awk into one save file per
+        attribute. The intersect keeps the order of the reference, and each
+        reference row is written to every attribute file (0 if it has no
+        overlap), so every save file for a node type has the same rows in the
+        same order.
+
+        Fields match the previous per-attribute `groupby -g 1,2,3,4`: the
+        summed size, then summed overlap in bp, or the mean rate for
+        recombination.
         """
+        attributes = [attribute for attribute in ATTRIBUTES if attribute != "gc"]
+        save_files = [
+            self._attribute_save_file(node_type, attribute) for attribute in attributes
+        ]
 
-        def sum_gc(feature: Any) -> str:
-            """Sum GC content for each feature"""
-            feature[13] = int(feature[8]) + int(feature[9])
-            return feature
-
-        if attribute == "gc":
-            return (
-                ref_file.nucleotide_content(fi=self.fasta)
-                .each(sum_gc)
-                .sort()
-                .groupby(g=[1, 2, 3, 4], c=[5, 14], o=["sum"])
-                .saveas(save_file)
-            )
-        elif attribute == "recombination":
-            return (
-                ref_file.intersect(
-                    BedTool(self.intermediate_sorted / f"{attribute}.bed"),
-                    wao=True,
-                    sorted=True,
-                )
-                .groupby(g=[1, 2, 3, 4], c=[5, 9], o=["sum", "mean"])
-                .sort()
-                .saveas(save_file)
-            )
-        else:
-            return (
-                ref_file.intersect(
-                    BedTool(self.intermediate_sorted / f"{attribute}.bed"),
-                    wao=True,
-                    sorted=True,
-                )
-                .groupby(g=[1, 2, 3, 4], c=[5, 10], o=["sum"])
-                .sort()
-                .saveas(save_file)
-            )
+        split_attributes = (
+            "function flush(   i, attr, size_sum, value, out) {"
+            "  for (i = 1; i <= n; i++) {"
+            "    attr = attrs[i];"
+            "    size_sum = (attr in sizes) ? sizes[attr] : size;"
+            "    if (attr == \"recombination\") {"
+            "      value = (attr in count) ? total[attr] / count[attr] : 0"
+            "    } else {"
+            "      value = total[attr] + 0"
+            "    }"
+            "    out = dir \"/\" attr \"/\" node \"_\" attr \"_percentage\";"
+            "    print key, size_sum, value > out"
+            "  }"
+            "}"
+            "BEGIN { n = split(names, attrs, \",\"); OFMT = \"%.10g\" }"
+            "{"
+            "  row = $1 OFS $2 OFS $3 OFS $4;"
+            "  if (NR > 1 && row != key) {"
+            "    flush(); delete sizes; delete total; delete count"
+            "  }"
+            "  key = row; size = $5;"
+            "  if ($NF > 0) {"
+            "    sizes[$6] += $5;"
+            "    total[$6] += ($6 == \"recombination\") ? $(NF - 1) : $NF;"
+            "    count[$6]++"
+            "  }"
+            "}"
+            "END { if (NR > 0) flush() }"
+        )
+        cmd = f"bedtools intersect \
+            -wao \
+            -sorted \
+            -iobuf {self.iobuf} \
+            -a {ref_file.fn} \
+            -b {' '.join(str(self.attribute_beds[attr]) for attr in attributes)} \
+            -names {' '.join(attributes)} \
+            | awk -v FS='\t' -v OFS='\t' \
+                -v names={','.join(attributes)} \
+                -v dir={self.attribute_dir} \
+                -v node={node_type} \
+                '{split_attributes}'"
+
+        def _split() -> None:
+            """Truncate save files, so an empty reference still leaves an empty
+            file per attribute, then intersect and split."""
+            for save_file in save_files:
+                open(save_file, "w").close()
+            self._run_cmd(cmd)
+
+        cached_run(
+            inputs=[ref_file.fn] + [self.attribute_beds[attr] for attr in attributes],
+            outputs=save_files,
+            function=_split,
+        )
 
     @time_decorator(print_args=True)
     def _generate_edges(self) -> None:
-        """Unix concatenate and sort each edge file with parallelization options."""
-        cmds = {
-            "cat_cmd": [
-                f"cat {self.edge_dir}/*_dupes_removed* >",
-                f"{self.edge_dir}/{self.all_concatenated_file}",
-            ],
-            "sort_cmd": [
-                f"LC_ALL=C sort --parallel={self.cores} -S 70% -k10,10 {self.edge_dir}/{self.all_concatenated_file} |",
-                "uniq >" f"{self.edge_dir}/{self.sorted_concatenated_file}",
-            ],
-        }
-        for cmd in cmds:
-            _chk_file_and_run(
-                cmds[cmd][1],
-                cmds[cmd][0] + cmds[cmd][1],
-            )
+        """Merge the presorted edge files into a single, deduplicated edge file.
+        Each edge file is already sorted on the whole line, so a linear merge
+        replaces the concatenate, full sort, and uniq."""
+        sorted_edges = self.edge_dir / self.sorted_concatenated_file
+        edge_files = sorted(self.edge_dir.glob("*_dupes_removed"))
+        edges = " ".join(str(file) for file in edge_files)
+        cached_run(
+            inputs=edge_files,
+            outputs=[sorted_edges],
+            function=lambda: self._run_cmd(
+                f"{self._sort()} -m -u {edges} -o {sorted_edges}"
+            ),
+        )
 
     def _save_node_attributes(self, node: str) -> None:
         """Save attributes for all node entries to create node attributes during
@@ -443,19 +585,40 @@ class LocalContextParser:
         # process attributes
         stored_attributes = self._process_node_attributes(node)
 
-        # save
+        # save with protocol 5 so positional encoding arrays are written as
+        # raw buffers
         with open(self.attribute_dir / f"{node}_reference.pkl", "wb") as output:
-            pickle.dump(stored_attributes, output)
-
-    def _read_attribute_file(self, filename: Path) -> set:
-        """Read the attribute file and return their aggregated contents."""
-        with open(filename, "r") as file:
-            return {tuple(line.rstrip().split("\t")) for line in file}
+            pickle.dump(stored_attributes, output, protocol=5)
+
+    def _read_attribute_file(self, node: str, attribute: str) -> pd.DataFrame:
+        """Read an aggregated attribute file into columns with the C parser.
+        Returns the name column and the attribute values; values the aggregate
+        could not provide default to 0."""
+        filename = self.attribute_dir / attribute / f"{node}_{attribute}_percentage"
+        if os.path.getsize(filename) == 0:
+            return pd.DataFrame({"name": [], "value": []})
+
+        attribute_df = pd.read_csv(
+            filename,
+            sep="\t",
+            header=None,
+            usecols=[3, 5],
+            dtype=str,
+            engine="c",
+        )
+        attribute_df.columns = ["name", "value"]
+        attribute_df["value"] = pd.to_numeric(
+            attribute_df["value"], errors="coerce"
+        ).fillna(0)
+        return attribute_df
 
     def _process_node_attributes(
         self, node: str
     ) -> Dict[str, Dict[str, Union[str, float, int, Dict[str, Union[str, int]]]]]:
-        """Add node attributes to reference dictionary for each feature type."""
+        """Add node attributes to reference dictionary for each feature type.
+        Every attribute file is aggregated from the same reference in the same
+        order, so files are read as columns and aligned by row instead of being
+        parsed line by line."""
         # initialize positional encoder
         positional_encoding = (
             self._initialize_positional_encoder()
@@ -463,36 +626,56 @@ class LocalContextParser:
             else None
         )
 
-        stored_attributes = {}
+        gc_file = self.attribute_dir / "gc" / f"{node}_gc_percentage"
+        if os.path.getsize(gc_file) == 0:
+            return {}
+        reference = pd.read_csv(
+            gc_file,
+            sep="\t",
+            header=None,
+            names=["chr", "start", "end", "name", "size", "gc"],
+            dtype={"chr": str, "name": str},
+            engine="c",
+        )
+
+        remaining: Dict[str, List[float]] = {}
         for attribute in ATTRIBUTES:
-            filename = self.attribute_dir / attribute / f"{node}_{attribute}_percentage"
-            lines = self._read_attribute_file(filename)
-            for line in lines:
-                try:
-                    node_key = f"{line[3]}_{self.tissue}"
-                    if attribute == "gc":
-                        stored_attributes[node_key] = self._add_first_attribute(
-                            line=line, positional_encoding=positional_encoding
-                        )
-                    else:
-                        self._add_remaining_attributes(
-                            stored_attributes=stored_attributes,
-                            node_key=node_key,
-                            attribute=attribute,
-                            line=line,
-                        )
-                except Exception as e:
-                    logger.error(f"Error processing {node} {attribute} {line}: {e}")
-                    raise
+            if attribute == "gc":
+                continue
+            attribute_df = self._read_attribute_file(node, attribute)
+            if not attribute_df["name"].equals(reference["name"]):
+                raise ValueError(
+                    f"{node} {attribute} rows do not align with the gc reference"
+                )
+            remaining[attribute] = attribute_df["value"].tolist()
+
+        encodings = (
+            self._positional_encodings(reference, positional_encoding)
+            if positional_encoding
+            else None
+        )
+
+        stored_attributes: Dict[
+            str, Dict[str, Union[str, float, int, Dict[str, Union[str, int]]]]
+        ] = {}
+        for idx, line in enumerate(reference.itertuples(index=False, name=None)):
+            node_key = f"{line[3]}_{self.tissue}"
+            attributes = self._add_first_attribute(
+                line=line,
+                encoding=encodings[idx] if encodings is not None else None,
+            )
+            for attribute, values in remaining.items():
+                attributes[attribute] = values[idx]
+            stored_attributes[node_key] = attributes
         return stored_attributes
 
     def _add_first_attribute(
         self,
-        line: Tuple[str, ...],
-        positional_encoding: Optional[PositionalEncoding],
+        line: Tuple[Any, ...],
+        encoding: Optional[np.ndarray],
     ) -> Dict[str, Union[str, float, int, Dict[str, Union[str, int]]]]:
         """Because gc is the first attribute processed, we take this time to
-        initialize some of the dictionary values and produce the positional
+        initialize some of the dictionary values and add the positional
         encodings."""
         try:
             attributes: Dict[
@@ -507,69 +690,87 @@ class LocalContextParser:
                 "gc": int(line[5]),
             }
 
-            if positional_encoding:
-                self._add_positional_encoding_attribute(
-                    line=line,
-                    positional_encoding=positional_encoding,
-                    attributes=attributes,
-                )
+            if encoding is not None:
+                attributes["positional_encoding"] = encoding
             return attributes
         except Exception as e:
             logger.error(f"Error processing gc {line}: {e}")
             raise
 
-    def _add_remaining_attributes(
-        self,
-        stored_attributes: Dict[
-            str, Dict[str, Union[str, float, int, Dict[str, Union[str, int]]]]
-        ],
-        node_key: str,
-        attribute: str,
-        line: tuple,
-    ) -> None:
-        """Add remaining attributes to the stored attributes dictionary. If the
-        attribute aggregate provided no value, defaults to 0."""
-        if node_key not in stored_attributes:
-            stored_attributes[node_key] = {}
-        try:
-            stored_attributes[node_key][attribute] = float(line[5])
-        except ValueError:
-            stored_attributes[node_key][attribute] = 0
-
     def _remove_blacklist_and_alt_configs(
         self,
         bed: BedTool,
         blacklist: BedTool,
+        outfile: Path,
+        post_filter: str = "cat",
     ) -> BedTool:
-        """Remove blacklist and alternate chromosomes from bedfile."""
-        return self._remove_alt_configs(bed.intersect(blacklist, sorted=True, v=True))
-
-    @time_decorator(print_args=True)
-    def _save_intermediate(
-        self, bed_dictionary: Dict[str, BedTool], folder: str
-    ) -> None:
-        """Save region specific bedfiles"""
-        for key in bed_dictionary:
-            file = self.parse_dir / "intermediate" / f"{folder}/{key}.bed"
-            if not os.path.exists(file):
-                bed_dictionary[key].saveas(file)
+        """Remove blacklist and alternate chromosomes from bedfile in a single
+        intersect | awk pipeline against the presorted blacklist, piping the
+        result through post_filter before it is written."""
+        cmd = f"bedtools intersect \
+            -v \
+            -sorted \
+            -iobuf {self.iobuf} \
+            -a {bed.fn} \
+            -b {blacklist.fn} \
+            | awk -v FS='\t' '$1 !~ /_/' \
+            | {post_filter} \
+            > {outfile}"
+        self._run_cmd(cmd)
+        return BedTool(outfile)
 
     @time_decorator(print_args=True)
     def _pre_concatenate_all_files(
-        self, all_files: str, bedcollection_slopped: Dict[str, BedTool]
-    ) -> None:
-        """Pre-concatenate via unix commands to save time"""
-        if not os.path.exists(all_files) or os.stat(all_files).st_size == 0:
-            cat_cmd = ["cat"] + [
-                self.intermediate_sorted / f"{x}.bed" for x in bedcollection_slopped
-            ]
-            sort_cmd = "sort -k1,1 -k2,2n"
-            concat = Popen(cat_cmd, stdout=PIPE)
-            with open(all_files, "w") as outfile:
-                subprocess.run(
-                    sort_cmd, stdin=concat.stdout, stdout=outfile, shell=True
+        self, all_files: Path, bedcollection_slopped: Dict[str, BedTool]
+    ) -> List[str]:
+        """Pre-concatenate via unix commands to save time. Each sorted file is
+        already in chr, start order, so they are merged rather than resorted.
+        The merged stream is teed into the concatenated file and the chromosome
+        shards, so it is only read once. If the sorted files are unchanged since
+        the last run, the merge is skipped and the existing file is sharded.
+        Returns the chromosomes in file order."""
+        sorted_files = [
+            self.intermediate_sorted / f"{key}.bed" for key in bedcollection_slopped
+        ]
+        chromosomes: List[str] = []
+
+        def _merge() -> None:
+            """Merge the sorted files and shard them by chromosome."""
+            self._prefetch_sequential(sorted_files)
+            cmd = f"{self._sort()} -m -k1,1 -k2,2n \
+                {' '.join(str(file) for file in sorted_files)}"
+            chromosomes.extend(
+                self._split_by_chromosome(
+                    bedfile=all_files, prefix="all", source_cmd=cmd
                 )
-            outfile.close()
+            )
+
+        if not cached_run(inputs=sorted_files, outputs=[all_files], function=_merge):
+            chromosomes = self._split_by_chromosome(bedfile=all_files, prefix="all")
+        return chromosomes
+
+    @staticmethod
+    def _run_cmd(cmd: str, **kwargs: Any) -> subprocess.CompletedProcess:
+        """Run a shell pipeline under bash with pipefail, so a failure in any
+        stage of the pipeline raises instead of passing truncated output on to
+        the next step."""
+        return subprocess.run(
+            ["bash", "-o", "pipefail", "-c", cmd], check=True, **kwargs
+        )
+
+    @staticmethod
+    def _prefetch_sequential(files: List[Path]) -> None:
+        """Hint the kernel to start reading files into the page cache ahead of
+        a sequential scan. No-op where posix_fadvise is unavailable."""
+        if not hasattr(os, "posix_fadvise"):
+            return
+        for file in files:
+            fd = os.open(file, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
 
     def _cleanup_edge_files(self) -> None:
         """Remove intermediate files"""
@@ -579,49 +780,56 @@ class LocalContextParser:
                 os.remove(self.edge_dir / item)
 
     @staticmethod
-    def _add_positional_encoding_attribute(
-        line: Tuple[str, ...],
+    def _positional_encodings(
+        reference: pd.DataFrame,
         positional_encoding: PositionalEncoding,
-        attributes: Dict[str, Union[str, float, int, Dict[str, Union[str, int]]]],
-    ) -> None:
-        """Add positional encoding to the attributes dictionary."""
-        chr_val = str(line[0])
-        start_val = int(line[1])
-        end_val = int(line[2])
-        attributes["positional_encoding"] = positional_encoding(
-            chromosome=chr_val, node_start=start_val, node_end=end_val
-        )
+    ) -> np.ndarray:
+        """Produce the positional encodings for every reference row in one
+        batched lookup. Encodings are small, bounded embedding values, so they
+        are stored in half precision."""
+        with torch.inference_mode():
+            encodings = positional_encoding.forward_batch(
+                chroms=reference["chr"].tolist(),
+                starts=reference["start"].to_numpy(),
+                ends=reference["end"].to_numpy(),
+            )
+        return encodings.cpu().numpy().astype(np.float16)
 
     @staticmethod
-    def _sort_bedcollection(bedcollection: Dict[str, BedTool]) -> Dict[str, BedTool]:
-        """Sort bedfiles in a collection"""
-        return {key: value.sort() for key, value in bedcollection.items()}
+    def _rename_feat_chr_start(prefix: str) -> str:
+        """Build an awk filter that adds chr, start to feature names in a single
+        pass. Cpgislands and other simple nodes are named by their prefix, while
+        all other nodes keep their name unless it already starts with chr_start.
+        Only coords and the new name are kept.
+        """
+        simple_rename = ["cpgislands", "crms", "superenhancers", "tfbindingsites"]
+        return f"awk -v FS='\t' -v OFS='\t' \
+            -v prefix={prefix} \
+            -v simple={int(prefix in simple_rename)} \
+            '{{ \
+                if (simple) {{ \
+                    name = $1\"_\"$2\"_\"prefix \
+                }} else {{ \
+                    n = split($4, parts, \"_\"); \
+                    name = (n >= 3 && parts[1] == $1 && parts[2] == $2) \
+                        ? $4 : $1\"_\"$2\"_\"$4 \
+                }} \
+                print $1, $2, $3, name \
+            }}'"
 
-    @staticmethod
     def _slop_and_keep_original(
-        bedfile: BedTool, chromfile: str, feat_window: int
+        self, bedfile: BedTool, chromfile: str, feat_window: int, outfile: Path
     ) -> BedTool:
-        """Slop a single bedfile and re-write each line to keep the original
-        entry."""
-        slopped = bedfile.slop(g=chromfile, b=feat_window).sort()
-        newstrings = [
-            str(line_1).split("\n")[0] + "\t" + str(line_2)
-            for line_1, line_2 in zip(slopped, bedfile)
-        ]
-        return BedTool("".join(newstrings), from_string=True).sort()
-
-    @staticmethod
-    def _remove_alt_configs(
-        bed: BedTool,
-    ) -> BedTool:
-        """Remove alternate chromosomes from bedfile."""
-        return bed.filter(lambda x: "_" not in x[0]).saveas()
-
-    @staticmethod
-    def _filter_duplicate_bed_entries(
-        bedfile: BedTool,
-    ) -> BedTool:
-        """Filters a bedfile by removing entries that are identical"""
-        return bedfile.filter(
-            lambda x: [x[0], x[1], x[2], x[3]] != [x[4], x[5], x[6], x[7]]
-        ).saveas()
+        """Slop a single bedfile and paste the original entry next to each
+        slopped line, streamed through a single shell pipeline."""
+        cmd = f"paste \
+            <(bedtools slop -i {bedfile.fn} -g {chromfile} -b {feat_window}) \
+            {bedfile.fn} \
+            | {self._sort()} -S 25% -k1,1 -k2,2n -o {outfile}"
+        cached_run(
+            inputs=[bedfile.fn, chromfile],
+            outputs=[outfile],
+            function=lambda: self._run_cmd(cmd),
+            params=(feat_window,),
+        )
+        return BedTool(outfile)
@@ -82,13 +82,13 @@ def parse_local_context(
             / tissue_config.resources["tissue"]
             / "local"
         )
-        keep_files = experiment_config.nodes + ATTRIBUTES + ["basenodes"]
+        keep_files = set(experiment_config.nodes + ATTRIBUTES + ["basenodes"])
         bedfiles = _get_files_in_directory(dir=local_dir)
 
         return [
             bedfile
             for bedfile in bedfiles
-            if bedfile.split("_")[0].casefold() in keep_files
+            if bedfile.partition("_")[0].casefold() in keep_files
         ]
 
     bedfiles_for_parsing = _get_config_filetypes(
@@ -178,17 +178,19 @@ class TPMFilter:
         bed: BedTool,
         genes: List[str],
     ) -> BedTool:
-        """Filter a pybedtools object by a list of genes."""
-        filter_term = lambda x: x[3] in genes
-        return bed.filter(filter_term).saveas()
+        """Filter a pybedtools object by a list of genes. The result streams, so
+        chained filters and the final sort do not write intermediate files."""
+        gene_set = set(genes)
+        filter_term = lambda x: x[3] in gene_set
+        return bed.filter(filter_term)
 
     @staticmethod
     def _filter_bedtool_by_autosomes(
         bed: BedTool,
     ) -> BedTool:
-        """Filter a pybedtools object by autosomes."""
-        filter_term = lambda x: x[0] not in ["chrX", "chrY", "chrM"]
-        return bed.filter(filter_term).saveas()
+        """Filter a pybedtools object by autosomes. The result streams."""
+        filter_term = lambda x: x[0] not in {"chrX", "chrY", "chrM"}
+        return bed.filter(filter_term)
 
     @staticmethod
     def _filter_gtex_dataframe_by_tpm(
@@ -17,9 +17,7 @@ from typing import List, Optional, Tuple, Union
 
 import numpy as np
 from scipy import stats  # type: ignore
-from scipy.stats import pearsonr  # type: ignore
 import torch
-import torch.nn.functional as F
 from torch.optim import Optimizer
 from torch.optim.lr_scheduler import LRScheduler
 from torch.optim.lr_scheduler import ReduceLROnPlateau
@@ -143,12 +141,13 @@ class GNNTrainer:
             mask=mask,
         )
 
-        # collect masked outputs and labels
-        regression_out_masked = self._ensure_tensor_dim(regression_out[mask])
-        labels_masked = self._ensure_tensor_dim(data.y[mask])
+        # collect masked outputs and labels, as views if every node is masked
+        index = self._mask_index(mask)
+        regression_out_masked = self._ensure_tensor_dim(regression_out[index])
+        labels_masked = self._ensure_tensor_dim(data.y[index])
 
-        classification_out_masked = self._ensure_tensor_dim(logits[mask])
-        class_labels_masked = self._ensure_tensor_dim(data.class_labels[mask])
+        classification_out_masked = self._ensure_tensor_dim(logits[index])
+        class_labels_masked = self._ensure_tensor_dim(data.class_labels[index])
 
         return (
             loss,
@@ -221,17 +220,21 @@ class GNNTrainer:
         self,
         data: torch_geometric.data.Data,
         mask: str,
-    ) -> Tuple[float, torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
-        """Evaluate a single batch."""
+    ) -> Tuple[
+        torch.Tensor,
+        torch.Tensor,
+        torch.Tensor,
+        torch.Tensor,
+        torch.Tensor,
+        torch.Tensor,
+    ]:
+        """Evaluate a single batch. The summed loss, the number of masked nodes,
+        and the masked outputs are all returned on device, so nothing in the
+        batch waits on a device sync.
+        """
         mask = getattr(data, f"{mask}_mask_loss")
-        if mask.sum() == 0:
-            return (
-                0.0,
-                torch.tensor([]),
-                torch.tensor([]),
-                torch.tensor([]),
-                torch.tensor([]),
-            )
+        count = mask.sum().to(self.device, non_blocking=True)
+
         # forward pass
         (
             loss,
@@ -243,13 +246,13 @@ class GNNTrainer:
             class_labels_masked,
         ) = self._forward_pass(data, mask)
 
-        batch_size_mask = int(mask.sum())
         return (
-            loss.item() * batch_size_mask,
-            regression_out_masked.cpu(),
-            labels_masked.cpu(),
-            classification_out_masked.cpu(),
-            class_labels_masked.cpu(),
+            loss.detach() * count,
+            count,
+            regression_out_masked,
+            labels_masked,
+            classification_out_masked,
+            class_labels_masked,
         )
 
     def train(
@@ -294,56 +297,74 @@ class GNNTrainer:
         )
         return final_loss, final_regression, final_classification
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def evaluate(
         self,
         data_loader: torch_geometric.data.DataLoader,
         epoch: int,
         mask: str,
         subset_batches: Optional[int] = None,
+        return_outputs: bool = False,
     ) -> Tuple[float, float, torch.Tensor, torch.Tensor, float, float]:
-        """Base function for model evaluation or inference."""
+        """Base function for model evaluation or inference. Loss and metrics
+        are folded into running sums on device per batch. Regression outputs
+        and labels are only kept, copied to host, and concatenated if
+        return_outputs is set; otherwise empty tensors are returned in their
+        place.
+        """
         self.model.eval()
         pbar = tqdm(total=len(data_loader))
         pbar.set_description(
             f"\nEvaluating {self.model.__class__.__name__} model @ epoch: {epoch}"
         )
 
-        total_loss = float(0)
-        total_examples = 0
+        # running sums of loss, count, x, y, x^2, y^2, xy, and correct classes
+        totals = torch.zeros(8, dtype=torch.float64, device=self.device)
         regression_outs, regression_labels = [], []
-        classification_outs, classification_labels = [], []
 
         for batch_idx, data in enumerate(data_loader):
             if subset_batches and batch_idx >= subset_batches:
                 break
 
-            loss, reg_out, reg_label, cls_out, cls_label = self._evaluate_single_batch(
+            (
+                loss,
+                count,
+                reg_out,
+                reg_label,
+                cls_out,
+                cls_label,
+            ) = self._evaluate_single_batch(
                 data=data,
                 mask=mask,
             )
-            total_loss += loss
-            total_examples += int(getattr(data, f"{mask}_mask_loss").sum())
+            totals += self._batch_sums(
+                loss=loss,
+                count=count,
+                regression_out=reg_out,
+                regression_label=reg_label,
+                classification_out=cls_out,
+                classification_label=cls_label,
+            )
 
-            regression_outs.append(reg_out)
-            regression_labels.append(reg_label)
-            classification_outs.append(cls_out)
-            classification_labels.append(cls_label)
+            if return_outputs:
+                regression_outs.append(self._to_host(reg_out))
+                regression_labels.append(self._to_host(reg_label))
 
             pbar.update(1)
 
         pbar.close()
+
+        # wait once for the running sums and any pending device to host copies
+        total_loss, total_examples, *regression_sums, correct = totals.tolist()
         average_loss = total_loss / total_examples if total_examples > 0 else 0.0
 
         # compute regression metrics
         rmse, pearson_r = self._compute_regression_metrics(
-            regression_outs, regression_labels
+            sums=regression_sums, n=int(total_examples)
         )
 
         # compute classification metrics
-        accuracy = self._compute_classification_metrics(
-            classification_outs, classification_labels
-        )
+        accuracy = correct / total_examples if total_examples > 0 else 0.0
 
         # log metrics
         self.logger.info(
@@ -354,8 +375,8 @@ class GNNTrainer:
         return (
             average_loss,
             rmse,
-            torch.cat(regression_outs),
-            torch.cat(regression_labels),
+            torch.cat(regression_outs) if regression_outs else torch.tensor([]),
+            torch.cat(regression_labels) if regression_labels else torch.tensor([]),
             pearson_r,
             accuracy,
         )
@@ -472,36 +493,51 @@ class GNNTrainer:
                 print(f"NaN gradient detected in {name}")
 
     @staticmethod
-    def _compute_regression_metrics(
-        regression_outs: List[torch.Tensor],
-        regression_labels: List[torch.Tensor],
-    ) -> Tuple[float, float]:
-        """Compute RMSE and Pearson's R for regression task."""
-        if not regression_outs or not regression_labels:
+    def _to_host(tensor: torch.Tensor) -> torch.Tensor:
+        """Start a non-blocking copy of a tensor to pinned host memory. The
+        copy must be synchronized before the result is read.
+        """
+        return tensor.to("cpu", non_blocking=True)
+
+    @staticmethod
+    def _batch_sums(
+        loss: torch.Tensor,
+        count: torch.Tensor,
+        regression_out: torch.Tensor,
+        regression_label: torch.Tensor,
+        classification_out: torch.Tensor,
+        classification_label: torch.Tensor,
+    ) -> torch.Tensor:
+        """Sums of a single batch for the running evaluation totals: loss,
+        count, x, y, x^2, y^2, xy, and correctly classified nodes."""
+        x = regression_out.detach().flatten().double()
+        y = regression_label.detach().flatten().double()
+        preds = (torch.sigmoid(classification_out) > 0.5).long()
+        correct = (preds == classification_label).sum()
+        values = (loss, count, x.sum(), y.sum(), x @ x, y @ y, x @ y, correct)
+        return torch.stack([value.double() for value in values])
+
+    @staticmethod
+    def _compute_regression_metrics(sums: List[float], n: int) -> Tuple[float, float]:
+        """Compute RMSE and Pearson's R for regression task from the running
+        sums of x, y, x^2, y^2, and xy over n outputs."""
+        if n == 0:
             return 0.0, 0.0
 
-        predictions = torch.cat(regression_outs).squeeze()
-        targets = torch.cat(regression_labels).squeeze()
-        mse = F.mse_loss(predictions, targets)
-        rmse = torch.sqrt(mse).item()
-        pearson_r, _ = pearsonr(predictions.numpy(), targets.numpy())
+        sum_x, sum_y, sum_xx, sum_yy, sum_xy = sums
+        rmse = math.sqrt(max(sum_xx - 2 * sum_xy + sum_yy, 0.0) / n)
+        covariance = n * sum_xy - sum_x * sum_y
+        variance = (n * sum_xx - sum_x**2) * (n * sum_yy - sum_y**2)
+        pearson_r = covariance / math.sqrt(variance) if variance > 0 else math.nan
 
         return rmse, pearson_r
 
     @staticmethod
-    def _compute_classification_metrics(
-        classification_outs: List[torch.Tensor],
-        classification_labels: List[torch.Tensor],
-    ) -> float:
-        """Compute accuracy for classification task."""
-        if not classification_outs or not classification_labels:
-            return 0.0
-
-        logits = torch.cat(classification_outs).squeeze()
-        labels = torch.cat(classification_labels).squeeze()
-        probs = torch.sigmoid(logits)
-        preds = (probs > 0.5).long()
-        return (preds == labels).float().mean().item()
+    def _mask_index(mask: torch.Tensor) -> Union[slice, torch.Tensor]:
+        """Index for selecting masked nodes. A full mask selects everything
+        with a slice, which returns a view instead of a boolean-indexed copy.
+        """
+        return slice(None) if bool(mask.all()) else mask
 
     @staticmethod
     def _ensure_tensor_dim(tensor: torch.Tensor) -> torch.Tensor:
@@ -662,6 +698,7 @@ def post_model_evaluation(
         data_loader=data_loader,
         mask="test",
         epoch=0,
+        return_outputs=True,
     )
 
     # save final eval
@@ -11,6 +11,7 @@ from contextlib import suppress
 import csv
 from datetime import timedelta
 import functools
+import hashlib
 import inspect
 import logging
 import os
@@ -32,9 +33,9 @@ from scipy.stats import spearmanr  # type: ignore
 import seaborn as sns  # type: ignore
 import torch
 from torch_geometric.data import Data  # type: ignore
-import yaml  # type: ignore
 
 from omics_graph_learning.utils.config_handlers import ExperimentConfig
+from omics_graph_learning.utils.config_handlers import load_yaml
 from omics_graph_learning.utils.config_handlers import TissueConfig
 
 
@@ -131,9 +132,39 @@ def check_and_symlink(src: Union[str, Path], dst: Path, boolean: bool = False) -
             os.symlink(src, dst)
 
 
+def batch_symlink(
+    links: List[Tuple[Union[str, Path], Path]], boolean: bool = False
+) -> None:
+    """Create symlinks for (src, dst) pairs whose dst doesn't exist. If boolean
+    is True, also skip pairs whose src doesn't exist. Existing names are read
+    with one listdir per directory instead of a stat per link.
+    """
+    listings: Dict[Path, Set[str]] = {}
+
+    def _listing(directory: Path) -> Set[str]:
+        if directory not in listings:
+            listings[directory] = (
+                set(os.listdir(directory)) if directory.is_dir() else set()
+            )
+        return listings[directory]
+
+    for src, dst in links:
+        src = Path(src)
+        if boolean and src.name not in _listing(src.parent):
+            continue
+        existing = _listing(dst.parent)
+        if dst.name not in existing:
+            with suppress(FileExistsError):
+                os.symlink(src, dst)
+            existing.add(dst.name)
+
+
 def _get_files_in_directory(dir: Path) -> List[str]:
-    """Return a list of files within the directory."""
-    return [file for file in os.listdir(dir) if os.path.isfile(os.path.join(dir, file))]
+    """Return a list of files within the directory. Uses a single scandir
+    sweep, which only stats entries whose type is not already known (e.g.
+    symlinks, which are followed)."""
+    with os.scandir(dir) as entries:
+        return [entry.name for entry in entries if entry.is_file()]
 
 
 def _add_hash_if_missing(file: str) -> None:
@@ -167,8 +198,7 @@ def _save_pickle(data: object, file_path: Union[str, Path]) -> None:
 
 def parse_yaml(config_file: str) -> Dict[str, Any]:
     """Load yaml for parsing"""
-    with open(config_file, "r") as stream:
-        return yaml.safe_load(stream)
+    return load_yaml(config_file)
 
 
 # command line operations
@@ -199,6 +229,45 @@ def _chk_file_and_run(file: str, cmd: str) -> None:
         subprocess.run(cmd, stdout=None, shell=True)
 
 
+def _input_fingerprint(inputs: List[Path], params: Tuple[Any, ...]) -> str:
+    """Hash the path, mtime, and size of each input together with any
+    parameters that change the output."""
+    digest = hashlib.sha256()
+    for file in inputs:
+        stat = os.stat(file)
+        key = f"{Path(file).resolve()}:{stat.st_mtime_ns}:{stat.st_size};"
+        digest.update(key.encode())
+    digest.update(repr(params).encode())
+    return digest.hexdigest()
+
+
+def cached_run(
+    inputs: List[Path],
+    outputs: List[Path],
+    function: Callable[[], Any],
+    params: Tuple[Any, ...] = (),
+) -> bool:
+    """Run `function` unless every output exists with a .sha256 sidecar that
+    matches the current inputs and params. Generalizes `_chk_file_and_run` so
+    that stages are rerun when their inputs change. Returns True if the function
+    was run.
+    """
+    fingerprint = _input_fingerprint(inputs, params)
+    sidecars = [Path(f"{output}.sha256") for output in outputs]
+    if all(
+        Path(output).is_file()
+        and sidecar.is_file()
+        and sidecar.read_text() == fingerprint
+        for output, sidecar in zip(outputs, sidecars)
+    ):
+        return False
+
+    function()
+    for sidecar in sidecars:
+        sidecar.write_text(fingerprint)
+    return True
+
+
 def get_remaining_walltime(logger: logging.Logger) -> Union[int, None]:
     """Get remaining walltime in seconds."""
     try:
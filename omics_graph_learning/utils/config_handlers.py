@@ -5,19 +5,32 @@
 """Class to handle stored and shared data from omics graph learning configs."""
 
 
+import copy
 from dataclasses import dataclass
+import functools
+import os
 from pathlib import Path
 from typing import Any, Dict, List, Union
 
 import yaml  # type: ignore
 
 
-def load_yaml(yaml_file: Union[Path, str]) -> Dict[str, Any]:
-    """Load a YAML file and return the contents as a dictionary."""
-    with open(yaml_file, "r") as stream:
+@functools.lru_cache(maxsize=8)
+def _parse_yaml_cached(yaml_path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a YAML file once per path and modification time."""
+    with open(yaml_path, "r") as stream:
         return yaml.safe_load(stream)
 
 
+def load_yaml(yaml_file: Union[Path, str]) -> Dict[str, Any]:
+    """Load a YAML file and return the contents as a dictionary. Repeat loads
+    of an unchanged file are served from cache; a deep copy is returned so the
+    config constructors can mutate their params freely."""
+    yaml_path = os.path.realpath(yaml_file)
+    params = _parse_yaml_cached(yaml_path, os.stat(yaml_path).st_mtime_ns)
+    return copy.deepcopy(params)
+
+
 @dataclass
 class ExperimentConfig:
     """Class representing the configuration for an experiment.
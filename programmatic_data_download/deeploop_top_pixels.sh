@@ -68,7 +68,7 @@ function _deeploop_gse_txt_to_bedpe () {
     fi
 
     # Process the file and sort the output
-    sed -e 's/:/\t/g' "$input_file" | sed 's/-/\t/' | sed 's/-/\t/' > "$output_file"
+    sed -e 's/:/\t/g' -e 's/-/\t/' -e 's/-/\t/' "$input_file" > "$output_file"
 
     echo "Reformatted coordinates have been saved to $output_file"
 }
@@ -6,10 +6,12 @@
 off of their BSS accession names"""
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import os
 from typing import List, Tuple
 
 import pandas as pd
+import requests  # type: ignore
 
 ATTRIBUTES = [
     "ATAC-seq",
@@ -96,11 +98,23 @@ def _format_urls(
     return observed_urls + imputed_urls
 
 
-def _download_files(urls: List[str], download_dir: str) -> None:
-    """Downloads files to a specified directory"""
+def _download_file(url: str, download_dir: str) -> None:
+    """Stream a single file to disk in 1 MiB chunks so the whole bigWig is
+    never held in memory"""
+    filename = os.path.join(download_dir, url.rsplit("/", 1)[-1])
+    with requests.get(url, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(filename, "wb") as file:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                file.write(chunk)
+
+
+def _download_files(urls: List[str], download_dir: str, workers: int = 4) -> None:
+    """Downloads files to a specified directory. Downloads are network-bound
+    and independent, so a few run at once."""
     os.makedirs(download_dir, exist_ok=True)
-    for url in urls:
-        os.system(f"wget -P {download_dir} {url} ")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda url: _download_file(url, download_dir), urls))
 
 
 def _list_all_downloads(
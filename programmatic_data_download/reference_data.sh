@@ -164,10 +164,8 @@ function _prepare_gencode_lookup_table () {
     local filtered_gencode_file=$1  # absolute path to filtered gencode bed file
     local lookup_table=$2  # absolute path to lookup table
 
-    cut -f4,10 ${filtered_gencode_file} \
-        | sed 's/;/\t/g' \
-        | cut -f1,5 \
-        | sed -e 's/ gene_name //g' -e 's/\"//g' \
+    awk 'BEGIN{FS=OFS="\t"} {split($10, a, ";"); gsub(/ gene_name |"/, "", a[4]); print $4, a[4]}' \
+        ${filtered_gencode_file} \
         > ${lookup_table}
 }
 
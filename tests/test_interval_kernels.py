@@ -0,0 +1,177 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+
+"""Test the compiled interval kernels against the bedtools and awk behavior
+they replace. Ensure that merges respect chromosome changes and bookended
+intervals, and that block-wise relabelling numbers lines across block
+boundaries.
+
+Example usage
+--------
+>>> pytest test_interval_kernels.py
+"""
+
+
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from omics_graph_learning.preprocessing.data_preprocessor import GenomeDataPreprocessor
+from omics_graph_learning.preprocessing.interval_kernels import counts_per_million
+from omics_graph_learning.preprocessing.interval_kernels import merge_intervals
+from omics_graph_learning.preprocessing.interval_kernels import merge_intervals_mean
+from omics_graph_learning.preprocessing.interval_kernels import relabel_lines
+import pytest
+
+
+@pytest.fixture
+def sorted_intervals() -> List[np.ndarray]:
+    """Sorted intervals with overlapping, bookended, and separate features, and
+    a chromosome change where the second chromosome starts before the last end
+    of the first."""
+    chroms = np.array([0, 0, 0, 0, 1, 1], dtype=np.int64)
+    starts = np.array([10, 15, 30, 50, 5, 100], dtype=np.int64)
+    ends = np.array([20, 30, 40, 60, 25, 110], dtype=np.int64)
+    values = np.array([1.0, 3.0, 5.0, 7.0, 2.0, 4.0])
+    return [chroms, starts, ends, values]
+
+
+@pytest.fixture
+def bed_lines() -> List[str]:
+    """Bed lines with extra columns to be dropped on relabelling."""
+    return [
+        "chr1\t10\t20\tpeak_a\t0\t+",
+        "chr1\t30\t40\tpeak_b\t0\t-",
+        "chr2\t5\t25\tpeak_c\t0\t+",
+        "chr2\t100\t110\tpeak_d\t0\t-",
+        "chr3\t1\t2\tpeak_e\t0\t+",
+    ]
+
+
+def _relabel(
+    tmp_path: Path,
+    text: str,
+    number: bool,
+    skip_header: bool = False,
+    block_size: int = 1 << 26,
+) -> List[str]:
+    """Write text to a bed file, relabel it block-wise, and return the lines."""
+    src = tmp_path / "input.bed"
+    dst = tmp_path / "output.bed"
+    src.write_text(text)
+    GenomeDataPreprocessor._relabel_bed_blocks(
+        src=src,
+        dst=dst,
+        label="tad",
+        number=number,
+        skip_header=skip_header,
+        block_size=block_size,
+    )
+    return dst.read_text().splitlines()
+
+
+def _expected(lines: List[str], number: bool) -> List[str]:
+    """Relabelled lines as written by `awk '{print $1, $2, $3, label}'`."""
+    return [
+        "\t".join(line.split("\t")[:3] + [f"tad_{idx}" if number else "tad"])
+        for idx, line in enumerate(lines, start=1)
+    ]
+
+
+def test_merge_intervals(sorted_intervals: List[np.ndarray]) -> None:
+    """Test that overlapping and bookended intervals merge, but not across
+    chromosomes."""
+    chroms, starts, ends, _ = sorted_intervals
+    out_chroms, out_starts, out_ends = merge_intervals(chroms, starts, ends)
+
+    assert out_chroms.tolist() == [0, 0, 1, 1]
+    assert out_starts.tolist() == [10, 50, 5, 100]
+    assert out_ends.tolist() == [40, 60, 25, 110]
+
+
+def test_merge_intervals_empty() -> None:
+    """Test that an empty bed merges to empty arrays."""
+    empty = np.array([], dtype=np.int64)
+    out_chroms, out_starts, out_ends = merge_intervals(empty, empty, empty)
+
+    assert out_chroms.size == out_starts.size == out_ends.size == 0
+
+
+def test_merge_intervals_mean(sorted_intervals: List[np.ndarray]) -> None:
+    """Test that values are averaged over each merged interval."""
+    chroms, starts, ends, values = sorted_intervals
+    out_chroms, out_starts, out_ends, out_means = merge_intervals_mean(
+        chroms, starts, ends, values
+    )
+
+    assert out_chroms.tolist() == [0, 0, 1, 1]
+    assert out_starts.tolist() == [10, 50, 5, 100]
+    assert out_ends.tolist() == [40, 60, 25, 110]
+    assert out_means.tolist() == pytest.approx([3.0, 7.0, 2.0, 4.0])
+
+
+@pytest.mark.parametrize("first_number", [0, 1, 9])
+def test_relabel_lines(bed_lines: List[str], first_number: int) -> None:
+    """Test constant and numbered labels, including a change in digit count."""
+    buffer = np.frombuffer(("\n".join(bed_lines) + "\n").encode(), dtype=np.uint8)
+    label = np.frombuffer(b"tad", dtype=np.uint8)
+    lines = relabel_lines(buffer, label, first_number).tobytes().decode()
+
+    expected = [
+        "\t".join(
+            line.split("\t")[:3]
+            + [f"tad_{first_number + idx}" if first_number else "tad"]
+        )
+        for idx, line in enumerate(bed_lines)
+    ]
+    assert lines.splitlines() == expected
+
+
+@pytest.mark.parametrize("number", [True, False])
+@pytest.mark.parametrize("block_size", [7, 32, 1 << 26])
+def test_relabel_bed_blocks(
+    tmp_path: Path, bed_lines: List[str], number: bool, block_size: int
+) -> None:
+    """Test that numbering continues across block boundaries."""
+    text = "\n".join(bed_lines) + "\n"
+    lines = _relabel(tmp_path, text, number=number, block_size=block_size)
+
+    assert lines == _expected(bed_lines, number=number)
+
+
+def test_relabel_bed_blocks_skip_header(tmp_path: Path, bed_lines: List[str]) -> None:
+    """Test that the header is dropped and numbering starts at the first
+    record."""
+    text = "chrom\tstart\tend\tname\tscore\tstrand\n" + "\n".join(bed_lines) + "\n"
+    lines = _relabel(tmp_path, text, number=True, skip_header=True, block_size=16)
+
+    assert lines == _expected(bed_lines, number=True)
+
+
+@pytest.mark.parametrize("block_size", [7, 1 << 26])
+def test_relabel_bed_blocks_no_trailing_newline(
+    tmp_path: Path, bed_lines: List[str], block_size: int
+) -> None:
+    """Test that a final line without a newline is kept and terminated."""
+    text = "\n".join(bed_lines)
+    lines = _relabel(tmp_path, text, number=True, block_size=block_size)
+
+    assert lines == _expected(bed_lines, number=True)
+    assert (tmp_path / "output.bed").read_bytes().endswith(b"\n")
+
+
+def test_counts_per_million() -> None:
+    """Test CPM normalization and the min_cpm cutoff."""
+    cpm, keep = counts_per_million(np.array([1, 0, 3], dtype=np.int64), 300000.0)
+
+    assert cpm.tolist() == pytest.approx([250000.0, 0.0, 750000.0])
+    assert keep.tolist() == [False, False, True]
+
+
+def test_counts_per_million_all_zero() -> None:
+    """Test that all-zero counts keep no rows instead of dividing by zero."""
+    cpm, keep = counts_per_million(np.zeros(3, dtype=np.int64), 1.0)
+
+    assert cpm.tolist() == [0.0, 0.0, 0.0]
+    assert not keep.any()
@@ -158,6 +158,23 @@ def test_model_output(model: Union[ModularGNN, DeeperGCN], graph_data: Data) ->
         assert param.grad is not None
 
 
+def test_half_precision_inputs(model: ModularGNN, graph_data: Data) -> None:
+    """Test that float16 node features, as kept on host by the interpretation
+    experiments, give regression outputs within tolerance of float32.
+
+    Raises:
+        AssertionError: If the float16 outputs differ from float32.
+    """
+    model.eval()
+    mask = torch.ones(graph_data.num_nodes, dtype=torch.bool)
+    with torch.no_grad():
+        full_out, _ = model(graph_data.x, graph_data.edge_index, mask)
+        half_out, _ = model(graph_data.x.half(), graph_data.edge_index, mask)
+
+    assert half_out.dtype == torch.float32
+    assert torch.allclose(half_out, full_out, rtol=1e-2, atol=1e-2)
+
+
 def test_modular_model_structure(
     model: ModularGNN, model_params: Dict[str, Any]
 ) -> None: